@@ -0,0 +1,507 @@
+"""
+Pluggable cart storage.
+
+Views work with the cart through a backend chosen by ``settings.CART_BACKEND``:
+
+* ``DatabaseCartBackend`` (default) keeps carts in ``Cart``/``CartItem``.
+* ``RedisCartBackend`` keeps the active cart as a Redis hash
+  (``cart:<user id>``: product id -> quantity), so cart writes are single
+  Redis commands and reads never touch the ``Cart`` row. Every write adds the user to ``cart:dirty``;
+  ``manage.py flush_carts`` persists those carts to ``Cart``/``CartItem``
+  as snapshots for analytics and durability. A cart missing from Redis
+  (expired or lost) is restored from its snapshot on first use. The
+  ``admin/carts``/``admin/cart-items`` row endpoints are read-only then.
+
+Both backends hand out ``CartItem`` instances so serializers are shared.
+With the Redis backend the items are unsaved and their ``id`` is the
+product id, which is what the item endpoints then expect.
+"""
+from decimal import Decimal
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from catalog.cache import get_generations
+from catalog.models import Product
+from ecommerce_backend.redis_client import redis_connection
+
+from .models import Cart, CartItem
+
+
+def get_cart_backend_class():
+    return import_string(settings.CART_BACKEND)
+
+
+def get_cart_backend(user):
+    return get_cart_backend_class()(user)
+
+
+def summary_key(user_id):
+    # Prices live on products, so the catalog product generation is part of the key
+    generation, = get_generations(('product',))
+    return f'cart:summary:{user_id}:{generation}'
+
+
+def invalidate_summary(user_id):
+    """Drop the cached summary now and again once the current transaction commits"""
+    key = summary_key(user_id)
+    cache.delete(key)
+    # A concurrent read may have cached pre-commit rows in between
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def mutation(method):
+    """Mark a backend method as changing the cart, invalidating its summary"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        invalidate_summary(self.user.pk)
+        return result
+    return wrapper
+
+
+def attach_items(cart, items):
+    """Serve ``cart.items.all()`` from ``items``, as prefetch_related would"""
+    queryset = cart.items.none()
+    queryset._result_cache = list(items)
+    queryset._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': queryset}
+    return cart
+
+
+def product_item(product, quantity):
+    """Unsaved line for carts kept outside the database; its id is the product id"""
+    return CartItem(id=product.pk, product=product, quantity=quantity)
+
+
+def items_for(quantities):
+    """Lines for ``{product_id: quantity}``, skipping products that no longer exist"""
+    products = Product.objects.select_related('category').in_bulk(list(quantities))
+    return [
+        product_item(products[product_id], quantity)
+        for product_id, quantity in quantities.items()
+        if product_id in products
+    ]
+
+
+def load_item(product_id, quantity):
+    product = Product.objects.select_related('category').filter(pk=product_id).first()
+    return product_item(product, quantity) if product else None
+
+
+class ItemList(list):
+    """List answering ``.all()`` like a related manager"""
+
+    def all(self):
+        return self
+
+
+class DetachedCart:
+    """Read-only stand-in for ``Cart`` when serializing a cart kept outside the database"""
+    id = None
+    created_at = None
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = ItemList(items)
+
+
+def summarize(quantities):
+    """Count and total of ``{product_id: quantity}`` with one price query"""
+    prices = dict(Product.objects.filter(pk__in=list(quantities)).values_list('pk', 'price'))
+    lines = [(prices[product_id], quantity) for product_id, quantity in quantities.items() if product_id in prices]
+    return {
+        'count': sum(quantity for _, quantity in lines),
+        'total': sum((price * quantity for price, quantity in lines), Decimal('0')),
+    }
+
+
+class BaseCartBackend:
+    # Whether Cart/CartItem rows are the live cart rather than snapshots of it
+    database_is_live = True
+
+    def __init__(self, user):
+        self.user = user
+
+    def get_cart(self):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        return cart
+
+    def items(self):
+        """Cart items with their products loaded"""
+        raise NotImplementedError
+
+    def get_item(self, item_id):
+        raise NotImplementedError
+
+    def add(self, product, quantity):
+        """Add ``quantity`` of ``product``; returns the resulting item"""
+        raise NotImplementedError
+
+    def set_quantity(self, item_id, quantity):
+        """Returns the updated item, or None if it is not in the cart"""
+        raise NotImplementedError
+
+    def adjust(self, item_id, delta):
+        """
+        Change an item's quantity by ``delta``, removing it when it drops to
+        zero (the returned item then has quantity 0). None if not in the cart.
+        """
+        raise NotImplementedError
+
+    def remove(self, item_id):
+        """Returns whether the item was in the cart"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Empty the cart; returns False if the user has no cart"""
+        raise NotImplementedError
+
+    def apply(self, operations):
+        """
+        Apply ordered ``{'op': 'add'|'set'|'remove', 'product_id', 'quantity'}``
+        operations atomically. Unlike the item endpoints, ``set`` creates
+        the line if it is missing.
+        """
+        raise NotImplementedError
+
+    def quantities(self):
+        """``{product_id: quantity}`` for checkout"""
+        return {item.product_id: item.quantity for item in self.items()}
+
+    def compute_summary(self):
+        """``{'count': units, 'total': Decimal}``"""
+        raise NotImplementedError
+
+    def summary(self):
+        """Item count and total for header badges, cached until the cart changes"""
+        key = summary_key(self.user.pk)
+        summary = cache.get(key)
+        if summary is None:
+            summary = self.compute_summary()
+            cache.set(key, summary, settings.CART_SUMMARY_TIMEOUT)
+        return summary
+
+
+def upsert_items(cart_id, quantities):
+    """
+    Add each ``{product_id: quantity}`` to the cart's lines in one statement,
+    creating missing lines. Relies on the unique (cart, product) constraint.
+    """
+    if not quantities:
+        return
+    if connection.vendor in ('postgresql', 'sqlite'):
+        table = connection.ops.quote_name(CartItem._meta.db_table)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = ', '.join(['(%s, %s, %s, %s)'] * len(quantities))
+        params = [
+            value
+            for product_id, quantity in quantities.items()
+            for value in (cart_id, product_id, quantity, now)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (cart_id, product_id, quantity, updated_at) VALUES {rows} "
+                f"ON CONFLICT (cart_id, product_id) DO UPDATE SET "
+                f"quantity = {table}.quantity + EXCLUDED.quantity, updated_at = EXCLUDED.updated_at",
+                params
+            )
+        return
+
+    # Backends without ON CONFLICT: increment, else insert, retrying if a concurrent insert wins
+    for product_id, quantity in quantities.items():
+        line = CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+        while not line.update(quantity=F('quantity') + quantity, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                break
+            except IntegrityError:
+                continue
+
+
+def fold_operations(operations):
+    """
+    Reduce ordered add/set/remove operations to one change per product:
+    ``(increments, absolutes)``, where increments are added to whatever the
+    line holds and absolutes (0 meaning remove) replace it.
+    """
+    increments, absolutes = {}, {}
+    for operation in operations:
+        product_id = operation['product_id']
+        if operation['op'] == 'add':
+            if product_id in absolutes:
+                absolutes[product_id] += operation['quantity']
+            else:
+                increments[product_id] = increments.get(product_id, 0) + operation['quantity']
+        else:
+            increments.pop(product_id, None)
+            absolutes[product_id] = operation['quantity'] if operation['op'] == 'set' else 0
+    return increments, absolutes
+
+
+class DatabaseCartBackend(BaseCartBackend):
+    """
+    Every mutation is a single statement: an upsert for adds, and a
+    conditional ``UPDATE`` with an ``F()`` expression or a ``DELETE`` for
+    the rest, so concurrent requests neither duplicate lines nor lose
+    increments. The item returned for the response is read afterwards.
+    """
+
+    def item_queryset(self):
+        return CartItem.objects.filter(cart__user=self.user)
+
+    def items(self):
+        return list(self.item_queryset().select_related('product__category'))
+
+    def get_item(self, item_id):
+        return self.item_queryset().select_related('product__category').filter(id=item_id).first()
+
+    def compute_summary(self):
+        return self.item_queryset().aggregate(
+            count=Coalesce(Sum('quantity'), 0),
+            total=Coalesce(
+                Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Decimal('0'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    @mutation
+    def add(self, product, quantity):
+        cart = self.get_cart()
+        upsert_items(cart.pk, {product.pk: quantity})
+        return CartItem.objects.select_related('product__category').get(cart=cart, product=product)
+
+    @mutation
+    def set_quantity(self, item_id, quantity):
+        if not self.item_queryset().filter(id=item_id).update(quantity=quantity, updated_at=timezone.now()):
+            return None
+        return self.get_item(item_id)
+
+    @mutation
+    def adjust(self, item_id, delta):
+        lines = self.item_queryset().filter(id=item_id)
+        # Only lines that stay positive are updated; the rest are removed
+        if lines.filter(quantity__gt=-delta).update(quantity=F('quantity') + delta, updated_at=timezone.now()):
+            return self.get_item(item_id)
+        if delta < 0 and lines.filter(quantity__lte=-delta).delete()[0]:
+            return CartItem(id=item_id, quantity=0)
+        return None
+
+    @mutation
+    def remove(self, item_id):
+        deleted, _ = self.item_queryset().filter(id=item_id).delete()
+        return bool(deleted)
+
+    @mutation
+    def clear(self):
+        try:
+            cart = Cart.objects.get(user=self.user)
+        except Cart.DoesNotExist:
+            return False
+        cart.items.all().delete()
+        return True
+
+    @mutation
+    @transaction.atomic
+    def apply(self, operations):
+        cart_id = self.get_cart().pk
+        increments, absolutes = fold_operations(operations)
+        upsert_items(cart_id, increments)
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                for product_id, quantity in absolutes.items() if quantity
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        removed = [product_id for product_id, quantity in absolutes.items() if not quantity]
+        if removed:
+            CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+
+
+DIRTY_KEY = 'cart:dirty'
+# Field that marks a hash as loaded, so an emptied cart is not restored from its snapshot
+LOADED_FIELD = 'loaded'
+
+# Atomically change a quantity only if the product is already in the cart
+ADJUST_SCRIPT = """
+local quantity = redis.call('HGET', KEYS[1], ARGV[1])
+if not quantity then return nil end
+if ARGV[3] == 'set' then
+    quantity = tonumber(ARGV[2])
+else
+    quantity = tonumber(quantity) + tonumber(ARGV[2])
+end
+if quantity > 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], quantity)
+else
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    quantity = 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('SADD', KEYS[2], ARGV[5])
+return quantity
+"""
+
+
+def cart_key(user_id):
+    return f'cart:{user_id}'
+
+
+def parse_hash(raw):
+    """Product id -> quantity from HGETALL output, without the marker field"""
+    return {
+        int(field): int(value)
+        for field, value in raw.items()
+        if field not in (LOADED_FIELD, LOADED_FIELD.encode())
+    }
+
+
+class RedisCartBackend(BaseCartBackend):
+    database_is_live = False
+
+    def __init__(self, user):
+        super().__init__(user)
+        self.connection = redis_connection()
+        if self.connection is None:
+            raise ImproperlyConfigured('RedisCartBackend needs the default cache to be django-redis (REDIS_URL).')
+        self.key = cart_key(user.pk)
+        self.ensure_loaded()
+
+    def ensure_loaded(self):
+        """Restore the cart from its database snapshot if Redis does not have it"""
+        if self.connection.exists(self.key):
+            return
+        snapshot = CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+        pipe = self.connection.pipeline()
+        # HSETNX so a write racing the restore is not overwritten
+        pipe.hsetnx(self.key, LOADED_FIELD, 1)
+        for product_id, quantity in snapshot:
+            pipe.hsetnx(self.key, product_id, quantity)
+        pipe.expire(self.key, settings.CART_REDIS_TTL)
+        pipe.execute()
+
+    def touch(self, pipe):
+        pipe.expire(self.key, settings.CART_REDIS_TTL)
+        pipe.sadd(DIRTY_KEY, self.user.pk)
+
+    def get_cart(self):
+        # The Cart row is only written by persist_carts
+        return DetachedCart(self.user, self.items())
+
+    def items(self):
+        return items_for(self.quantities())
+
+    def compute_summary(self):
+        return summarize(self.quantities())
+
+    def get_item(self, item_id):
+        quantity = self.connection.hget(self.key, item_id)
+        return None if quantity is None else load_item(item_id, int(quantity))
+
+    @mutation
+    def add(self, product, quantity):
+        pipe = self.connection.pipeline()
+        pipe.hincrby(self.key, product.pk, quantity)
+        self.touch(pipe)
+        total = pipe.execute()[0]
+        return product_item(product, total)
+
+    def run_adjust(self, item_id, value, mode):
+        script = self.connection.register_script(ADJUST_SCRIPT)
+        quantity = script(
+            keys=[self.key, DIRTY_KEY],
+            args=[item_id, value, mode, settings.CART_REDIS_TTL, self.user.pk]
+        )
+        return None if quantity is None else load_item(item_id, int(quantity))
+
+    @mutation
+    def set_quantity(self, item_id, quantity):
+        return self.run_adjust(item_id, quantity, 'set')
+
+    @mutation
+    def adjust(self, item_id, delta):
+        return self.run_adjust(item_id, delta, 'add')
+
+    @mutation
+    def remove(self, item_id):
+        pipe = self.connection.pipeline()
+        pipe.hdel(self.key, item_id)
+        self.touch(pipe)
+        return bool(pipe.execute()[0])
+
+    @mutation
+    def clear(self):
+        pipe = self.connection.pipeline()
+        pipe.delete(self.key)
+        pipe.hset(self.key, LOADED_FIELD, 1)
+        self.touch(pipe)
+        pipe.execute()
+        return True
+
+    @mutation
+    def apply(self, operations):
+        # MULTI/EXEC keeps the batch atomic and in order
+        pipe = self.connection.pipeline(transaction=True)
+        for operation in operations:
+            product_id = operation['product_id']
+            if operation['op'] == 'add':
+                pipe.hincrby(self.key, product_id, operation['quantity'])
+            elif operation['op'] == 'set':
+                pipe.hset(self.key, product_id, operation['quantity'])
+            else:
+                pipe.hdel(self.key, product_id)
+        self.touch(pipe)
+        pipe.execute()
+
+    def quantities(self):
+        return parse_hash(self.connection.hgetall(self.key))
+
+
+def persist_carts(batch_size=500):
+    """Write the carts changed since the last run to the database; returns carts written"""
+    connection = redis_connection()
+    if connection is None:
+        return 0
+    written = 0
+    while True:
+        # Popped before reading, so a write racing the flush marks the cart dirty again
+        user_ids = [int(user_id) for user_id in connection.spop(DIRTY_KEY, batch_size) or []]
+        if not user_ids:
+            return written
+        for position, user_id in enumerate(user_ids):
+            try:
+                persist_cart(connection, user_id)
+            except Exception:
+                # Keep the carts not yet written dirty for the next run
+                connection.sadd(DIRTY_KEY, *user_ids[position:])
+                raise
+            written += 1
+
+
+def persist_cart(connection, user_id):
+    raw = connection.hgetall(cart_key(user_id))
+    if not raw:
+        # Expired before it was flushed; keep the last snapshot
+        return
+    quantities = parse_hash(raw)
+    existing = set(Product.objects.filter(pk__in=list(quantities)).values_list('pk', flat=True))
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        cart.items.all().delete()
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if product_id in existing
+        )
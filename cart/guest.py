@@ -0,0 +1,164 @@
+"""
+Guest carts for anonymous visitors.
+
+A guest cart is never stored server-side: its ``[[product_id, quantity], ...]``
+lines travel in a compressed, signed token (``django.core.signing``) that
+is read from the ``X-Guest-Cart`` header or the guest cart cookie and
+re-issued in both whenever the cart changes. Tampered or expired tokens
+read as an empty cart.
+
+On login or registration ``merge_guest_cart`` adds the guest lines to the
+user's cart with one bulk upsert and drops the cookie.
+"""
+from django.conf import settings
+from django.core import signing
+from rest_framework import serializers
+
+from catalog.models import Product
+
+from .backends import BaseCartBackend, DetachedCart, get_cart_backend, items_for, load_item, product_item, summarize
+from .models import CartItem
+
+
+GUEST_SALT = 'cart.guest'
+GUEST_HEADER = 'X-Guest-Cart'
+
+
+def load_token(token):
+    """``{product_id: quantity}`` from a token; empty if it is invalid"""
+    if not token:
+        return {}
+    try:
+        lines = signing.loads(token, salt=GUEST_SALT, max_age=settings.CART_GUEST_MAX_AGE)
+        return {int(product_id): int(quantity) for product_id, quantity in lines if int(quantity) > 0}
+    except (signing.BadSignature, TypeError, ValueError):
+        return {}
+
+
+def dump_token(quantities):
+    return signing.dumps(sorted(quantities.items()), salt=GUEST_SALT, compress=True)
+
+
+def request_token(request):
+    return request.headers.get(GUEST_HEADER) or request.COOKIES.get(settings.CART_GUEST_COOKIE)
+
+
+class GuestCartBackend(BaseCartBackend):
+    """Cart kept in a signed token; item ids are product ids"""
+
+    def __init__(self, token=None):
+        super().__init__(None)
+        self.lines = load_token(token)
+        self.changed = False
+
+    def token(self):
+        return dump_token(self.lines)
+
+    def store(self, product_id, quantity):
+        if quantity > 0:
+            if product_id not in self.lines and len(self.lines) >= settings.CART_GUEST_MAX_LINES:
+                raise serializers.ValidationError(
+                    f"Guest carts hold up to {settings.CART_GUEST_MAX_LINES} products. Sign in to add more."
+                )
+            self.lines[product_id] = quantity
+        else:
+            self.lines.pop(product_id, None)
+        self.changed = True
+
+    def get_cart(self):
+        return DetachedCart(None, self.items())
+
+    def items(self):
+        return items_for(self.lines)
+
+    def get_item(self, item_id):
+        quantity = self.lines.get(int(item_id))
+        return None if quantity is None else load_item(item_id, quantity)
+
+    def add(self, product, quantity):
+        self.store(product.pk, self.lines.get(product.pk, 0) + quantity)
+        return product_item(product, self.lines[product.pk])
+
+    def set_quantity(self, item_id, quantity):
+        if int(item_id) not in self.lines:
+            return None
+        self.store(int(item_id), quantity)
+        return self.get_item(item_id)
+
+    def adjust(self, item_id, delta):
+        quantity = self.lines.get(int(item_id))
+        if quantity is None:
+            return None
+        self.store(int(item_id), quantity + delta)
+        if quantity + delta <= 0:
+            return CartItem(id=item_id, quantity=0)
+        return self.get_item(item_id)
+
+    def remove(self, item_id):
+        if int(item_id) not in self.lines:
+            return False
+        self.store(int(item_id), 0)
+        return True
+
+    def clear(self):
+        self.lines = {}
+        self.changed = True
+        return True
+
+    def apply(self, operations):
+        lines = dict(self.lines)
+        try:
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == 'add':
+                    self.store(product_id, self.lines.get(product_id, 0) + operation['quantity'])
+                elif operation['op'] == 'set':
+                    self.store(product_id, operation['quantity'])
+                else:
+                    self.store(product_id, 0)
+        except serializers.ValidationError:
+            # All or nothing, like the stored backends
+            self.lines = lines
+            raise
+
+    def quantities(self):
+        return dict(self.lines)
+
+    def summary(self):
+        # Nothing to invalidate against, so not cached
+        return summarize(self.lines)
+
+
+def get_request_cart_backend(request):
+    """The user's cart backend, or a guest cart for anonymous requests"""
+    if request.user.is_authenticated:
+        return get_cart_backend(request.user)
+    return GuestCartBackend(request_token(request))
+
+
+def set_guest_token(response, backend):
+    token = backend.token()
+    response[GUEST_HEADER] = token
+    response.set_cookie(
+        settings.CART_GUEST_COOKIE,
+        token,
+        max_age=settings.CART_GUEST_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+def merge_guest_cart(request, user, response):
+    """Add the request's guest cart to ``user``'s cart and drop the cookie"""
+    quantities = load_token(request_token(request))
+    if quantities:
+        existing = set(Product.objects.filter(pk__in=list(quantities)).values_list('pk', flat=True))
+        get_cart_backend(user).apply([
+            {'op': 'add', 'product_id': product_id, 'quantity': quantity}
+            for product_id, quantity in quantities.items()
+            if product_id in existing
+        ])
+    if settings.CART_GUEST_COOKIE in request.COOKIES:
+        response.delete_cookie(settings.CART_GUEST_COOKIE, samesite='Lax')
+    return response
@@ -0,0 +1,109 @@
+"""
+Abandoned cart reaping.
+
+A cart is reaped when its user is gone (``Cart.user`` is SET_NULL) or when
+it was created before the cutoff and none of its lines changed since.
+``reap_carts`` walks the cart table in primary-key ranges of
+``batch_size``: each range is selected, optionally archived, and deleted
+in its own short transaction, with an optional sleep between ranges, so no
+lock is held for long and replicas keep up.
+
+Bytes reclaimed are the tuple sizes of the deleted rows (PostgreSQL's
+``pg_column_size``); the space is reused after autovacuum, or returned
+immediately with ``vacuum``. Other databases report rows only (``bytes`` is None).
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+
+def reapable(cutoff):
+    recent_lines = CartItem.objects.filter(cart=OuterRef('pk'), updated_at__gte=cutoff)
+    return Cart.objects.filter(Q(user__isnull=True) | (Q(created_at__lt=cutoff) & ~Exists(recent_lines)))
+
+
+def row_bytes(model, ids):
+    """Total tuple size of ``model`` rows matching ``ids`` (PostgreSQL)"""
+    if not ids:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = 'cart_id' if model is CartItem else 'id'
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {table} t WHERE {column} = ANY(%s)", [ids])
+        return cursor.fetchone()[0]
+
+
+def table_bytes():
+    """On-disk size of the cart tables with indexes (PostgreSQL only)"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_total_relation_size(%s) + pg_total_relation_size(%s)",
+            [Cart._meta.db_table, CartItem._meta.db_table]
+        )
+        return cursor.fetchone()[0]
+
+
+def archive_rows(archive, cart_ids):
+    items = {}
+    for cart_id, product_id, quantity in CartItem.objects.filter(cart_id__in=cart_ids).values_list(
+        'cart_id', 'product_id', 'quantity'
+    ):
+        items.setdefault(cart_id, []).append([product_id, quantity])
+    for cart in Cart.objects.filter(pk__in=cart_ids).values('id', 'user_id', 'created_at'):
+        cart['created_at'] = cart['created_at'].isoformat()
+        cart['items'] = items.get(cart['id'], [])
+        archive.write(json.dumps(cart) + '\n')
+
+
+def vacuum():
+    tables = [Cart._meta.db_table, CartItem._meta.db_table]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in tables:
+                cursor.execute(f"VACUUM (ANALYZE) {connection.ops.quote_name(table)}")
+        elif connection.vendor == 'sqlite':
+            cursor.execute("VACUUM")
+
+
+def reap_carts(max_idle_days, batch_size=1000, sleep=0, archive=None, dry_run=False):
+    """
+    Delete (or, with ``dry_run``, count) abandoned carts. ``archive`` is a
+    text file receiving one JSON line per reaped cart. Returns the report dict.
+    """
+    cutoff = timezone.now() - timedelta(days=max_idle_days)
+    report = {'carts': 0, 'items': 0, 'bytes': 0 if connection.vendor == 'postgresql' else None, 'batches': 0}
+    bounds = Cart.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return report
+
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        with transaction.atomic():
+            cart_ids = list(
+                reapable(cutoff).filter(pk__gte=start, pk__lt=start + batch_size)
+                .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+                .values_list('pk', flat=True)
+            )
+            if not cart_ids:
+                continue
+            if report['bytes'] is not None:
+                report['bytes'] += row_bytes(Cart, cart_ids) + row_bytes(CartItem, cart_ids)
+            if archive is not None:
+                archive_rows(archive, cart_ids)
+            if dry_run:
+                report['items'] += CartItem.objects.filter(cart_id__in=cart_ids).count()
+                report['carts'] += len(cart_ids)
+            else:
+                report['items'] += CartItem.objects.filter(cart_id__in=cart_ids).delete()[0]
+                report['carts'] += Cart.objects.filter(pk__in=cart_ids).delete()[1].get(Cart._meta.label, 0)
+        report['batches'] += 1
+        if sleep:
+            time.sleep(sleep)
+    return report
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart.backends import persist_carts
+
+
+class Command(BaseCommand):
+    help = (
+        'Persist carts changed in Redis to Cart/CartItem snapshots '
+        '(only needed with the Redis cart backend)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Dirty carts taken from Redis per round trip (default: 500)'
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and flush every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between flushes in --watch mode (default: 30)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            written = persist_carts(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Persisted {written} carts"))
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.maintenance import reap_carts, table_bytes, vacuum
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete carts whose user is gone or whose lines have not changed for '
+        '--days, in primary-key batches; optionally archive them and vacuum'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.CART_MAX_IDLE_DAYS,
+            help=f'Idle age after which a cart is abandoned (default: {settings.CART_MAX_IDLE_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cart primary keys covered per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between batches (default: 0.1)'
+        )
+        parser.add_argument(
+            '--archive',
+            help='Append reaped carts to this file as JSON Lines before deleting them'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be reaped without deleting anything'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='VACUUM the cart tables afterwards to return space to the OS/planner'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--days must not be negative and --batch-size must be positive')
+
+        size_before = table_bytes()
+        reap_options = dict(
+            max_idle_days=options['days'],
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            dry_run=options['dry_run'],
+        )
+        if options['archive']:
+            with open(options['archive'], 'a', encoding='utf-8') as archive:
+                report = reap_carts(archive=archive, **reap_options)
+        else:
+            report = reap_carts(**reap_options)
+
+        verb = 'Would reap' if options['dry_run'] else 'Reaped'
+        reclaimed = '' if report['bytes'] is None else f", {report['bytes']} bytes of rows"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['carts']} carts ({report['items']} items{reclaimed}) in {report['batches']} batches"
+        ))
+        if options['vacuum'] and not options['dry_run']:
+            vacuum()
+            size_after = table_bytes()
+            if size_before is not None:
+                self.stdout.write(f"Cart tables: {size_before} -> {size_after} bytes on disk")
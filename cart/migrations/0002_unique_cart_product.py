@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Fold duplicate (cart, product) rows into the oldest one, summing quantities
+    CartItem = apps.get_model('cart', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in list(duplicates):
+        CartItem.objects.filter(pk=row['keep']).update(quantity=row['total'])
+        CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('catalog', '0013_product_trending_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
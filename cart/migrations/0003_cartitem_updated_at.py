@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_unique_cart_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -15,6 +15,14 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Last change to the line; carts with no recent lines are reaped by `manage.py reap_carts`
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Target of the ON CONFLICT upsert in cart.backends
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.title}"
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
 from catalog.serializers import ProductSerializer
+from ecommerce_backend.sparse_fields import SparseFieldsetMixin
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     subtotal = serializers.SerializerMethodField()
@@ -12,6 +13,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'subtotal']
         read_only_fields = ['id', 'subtotal']
+        sparse_sources = {'subtotal': ['quantity', 'product__price']}
 
     def get_subtotal(self, obj):
         return obj.quantity * obj.product.price
@@ -22,7 +24,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
     total_items = serializers.SerializerMethodField()
@@ -31,6 +33,8 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user', 'created_at', 'items', 'total_price', 'total_items']
         read_only_fields = ['id', 'user', 'created_at', 'total_price', 'total_items']
+        sparse_sources = {'total_price': [], 'total_items': []}
+        sparse_prefetch = {'total_price': ['items__product'], 'total_items': ['items']}
 
     def get_total_price(self, obj):
         return sum(item.quantity * item.product.price for item in obj.items.all())
@@ -56,3 +60,34 @@ class UpdateCartItemSerializer(serializers.Serializer):
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0.")
         return value
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OPS = ('add', 'set', 'remove')
+
+    op = serializers.ChoiceField(choices=OPS)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'remove':
+            attrs.pop('quantity', None)
+        elif attrs.get('quantity') is None:
+            raise serializers.ValidationError({'quantity': f"Required for '{attrs['op']}'."})
+        elif attrs['quantity'] <= 0:
+            raise serializers.ValidationError({'quantity': "Quantity must be greater than 0."})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_operations(self, value):
+        from catalog.models import Product
+
+        product_ids = {operation['product_id'] for operation in value}
+        existing = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        missing = sorted(product_ids - existing)
+        if missing:
+            raise serializers.ValidationError(f"Products do not exist: {', '.join(map(str, missing))}.")
+        return value
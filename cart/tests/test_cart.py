@@ -1,6 +1,24 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from cart.backends import DIRTY_KEY, cart_key, persist_carts
 from cart.models import Cart, CartItem
+from ecommerce_backend.redis_client import redis_connection
 from catalog.models import Product, Category
 
 User = get_user_model()
@@ -40,3 +58,282 @@ class CartModelTest(TestCase):
 
         # If no method, test manually
         self.assertEqual(expected_total, 31.98)
+
+
+class CartBackendApiTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="shopper@example.com", username="shopper", password="testpass")
+        category = Category.objects.create(name="Electronics")
+        self.mouse = Product.objects.create(title="Mouse", price=15, category=category, stock_quantity=10)
+        self.keyboard = Product.objects.create(title="Keyboard", price=40, category=category, stock_quantity=10)
+        self.client.force_authenticate(self.user)
+        cache.clear()
+
+    def exercise_cart(self):
+        response = self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mouse_item = response.data['id']
+        response = self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 1})
+        self.assertEqual(response.data['quantity'], 3)
+        keyboard_item = self.client.post(reverse('add_to_cart'), {'product_id': self.keyboard.pk}).data['id']
+
+        self.assertEqual(self.client.patch(reverse('increase_quantity', args=[keyboard_item])).data['quantity'], 2)
+        self.client.patch(reverse('update_cart_item', args=[mouse_item]), {'quantity': 1})
+        response = self.client.patch(reverse('decrease_quantity', args=[mouse_item]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.patch(reverse('increase_quantity', args=[mouse_item])).status_code, 404)
+
+        response = self.client.get(reverse('cart_detail'))
+        self.assertEqual([item['product']['title'] for item in response.data['items']], ["Keyboard"])
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertEqual(self.client.get(reverse('cart_total')).data['total'], 80)
+
+        # Checkout without an item list takes the stored cart and empties it
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_order'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_amount'], '80.00')
+        self.assertEqual(self.client.get(reverse('cart_count')).data['count'], 0)
+
+    def test_database_backend(self):
+        self.exercise_cart()
+
+    @skipUnless(settings.REDIS_URL, 'RedisCartBackend needs REDIS_URL')
+    def test_redis_backend_persists_snapshots(self):
+        redis_cache = {
+            'default': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': settings.REDIS_URL,
+                'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+            }
+        }
+        with override_settings(CART_BACKEND='cart.backends.RedisCartBackend', CACHES=redis_cache):
+            redis_connection().delete(cart_key(self.user.pk), DIRTY_KEY)
+            self.client.post(reverse('add_to_cart'), {'product_id': self.keyboard.pk, 'quantity': 2})
+            self.assertEqual(self.client.get(reverse('cart_detail')).data['total_items'], 2)
+            # Reads and writes stay in Redis until the flush
+            self.assertFalse(Cart.objects.filter(user=self.user).exists())
+            self.assertEqual(persist_carts(), 1)
+            self.assertEqual(
+                list(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')),
+                [(self.keyboard.pk, 2)]
+            )
+            # A cart lost from Redis comes back from its snapshot
+            redis_connection().delete(cart_key(self.user.pk))
+            self.assertEqual(self.client.get(reverse('cart_count')).data['count'], 2)
+            self.client.delete(reverse('clear_cart'))
+            self.exercise_cart()
+            redis_connection().delete(cart_key(self.user.pk), DIRTY_KEY)
+
+    @skipUnless(settings.REDIS_URL, 'RedisCartBackend needs REDIS_URL')
+    def test_failed_flush_keeps_carts_dirty(self):
+        connection = redis_connection()
+        connection.delete(cart_key(self.user.pk), DIRTY_KEY)
+        connection.hset(cart_key(self.user.pk), self.keyboard.pk, 2)
+        connection.sadd(DIRTY_KEY, self.user.pk)
+        with mock.patch('cart.backends.Cart.objects.get_or_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                persist_carts()
+        self.assertTrue(connection.sismember(DIRTY_KEY, self.user.pk))
+        self.assertEqual(persist_carts(), 1)
+        self.assertEqual(connection.scard(DIRTY_KEY), 0)
+        connection.delete(cart_key(self.user.pk), DIRTY_KEY)
+
+    def test_cart_rows_are_read_only_when_redis_holds_the_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.mouse, quantity=2)
+        with override_settings(CART_BACKEND='cart.backends.RedisCartBackend'):
+            self.assertEqual(self.client.get(reverse('cartitem-list')).status_code, status.HTTP_200_OK)
+            response = self.client.patch(reverse('cartitem-detail', args=[item.pk]), {'quantity': 5})
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+            response = self.client.delete(reverse('cart-detail', args=[cart.pk]))
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+        response = self.client.patch(reverse('cartitem-detail', args=[item.pk]), {'quantity': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_adding_an_existing_line_is_one_upsert(self):
+        self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 2})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 3})
+        self.assertEqual(response.data['quantity'], 5)
+        writes = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user, product=self.mouse).count(), 1)
+
+    def test_unique_cart_line(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.mouse, quantity=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=cart, product=self.mouse, quantity=1)
+
+    def test_batch_applies_operations_in_order(self):
+        self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 4})
+        operations = [
+            {'op': 'add', 'product_id': self.keyboard.pk, 'quantity': 1},
+            {'op': 'add', 'product_id': self.keyboard.pk, 'quantity': 2},
+            {'op': 'add', 'product_id': self.mouse.pk, 'quantity': 1},
+            {'op': 'remove', 'product_id': self.mouse.pk},
+            {'op': 'set', 'product_id': self.mouse.pk, 'quantity': 2},
+            {'op': 'add', 'product_id': self.mouse.pk, 'quantity': 1},
+        ]
+        response = self.client.post(reverse('cart_batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted((item['product']['title'], item['quantity']) for item in response.data['items']),
+            [("Keyboard", 3), ("Mouse", 3)]
+        )
+
+    def test_batch_rejects_unknown_products_without_applying_anything(self):
+        operations = [
+            {'op': 'add', 'product_id': self.mouse.pk, 'quantity': 1},
+            {'op': 'set', 'product_id': 9999, 'quantity': 1},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('cart_batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sum('catalog_product' in q['sql'] for q in queries.captured_queries), 1)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_summary_is_one_aggregate_and_cached_until_the_cart_changes(self):
+        self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 2})
+        self.client.post(reverse('add_to_cart'), {'product_id': self.keyboard.pk, 'quantity': 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_summary'))
+        self.assertEqual(response.data, {'count': 3, 'total': Decimal('70.00')})
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('SUM', queries.captured_queries[0]['sql'])
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('cart_count'))
+        self.client.post(reverse('add_to_cart'), {'product_id': self.mouse.pk, 'quantity': 1})
+        self.assertEqual(self.client.get(reverse('cart_total')).data['total'], Decimal('85.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mouse.price = 20
+            self.mouse.save()
+        self.assertEqual(self.client.get(reverse('cart_summary')).data['total'], Decimal('100.00'))
+
+    def test_cart_detail_query_count_does_not_grow_with_the_cart(self):
+        category = Category.objects.create(name="Accessories")
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.mouse, quantity=1)
+        # Cart row, then items joined to product and category
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cart_detail'))
+
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=Product.objects.create(title=f"Cable {n}", price=3, category=category), quantity=2)
+            for n in range(30)
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart_detail'))
+        self.assertEqual(len(response.data['items']), 31)
+        self.assertEqual(response.data['total_items'], 61)
+        self.assertEqual({item['product']['category_name'] for item in response.data['items']}, {"Electronics", "Accessories"})
+
+
+class GuestCartTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Books")
+        self.novel = Product.objects.create(title="Novel", price=12, category=category, stock_quantity=10)
+        self.atlas = Product.objects.create(title="Atlas", price=30, category=category, stock_quantity=10)
+        self.user = User.objects.create_user(email="reader@example.com", username="reader", password="password123")
+
+    def test_anonymous_cart_lives_in_the_token(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('add_to_cart'), {'product_id': self.novel.pk, 'quantity': 2})
+            self.client.post(reverse('add_to_cart'), {'product_id': self.atlas.pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in queries.captured_queries))
+        self.assertFalse(Cart.objects.exists())
+
+        # The cookie is carried by the test client; header clients send the token back themselves
+        response = self.client.patch(reverse('decrease_quantity', args=[self.novel.pk]))
+        self.assertEqual(response.data['quantity'], 1)
+        token = response['X-Guest-Cart']
+        self.assertEqual(self.client.get(reverse('cart_summary')).data, {'count': 2, 'total': Decimal('42.00')})
+
+        other = APIClient()
+        response = other.get(reverse('cart_detail'), HTTP_X_GUEST_CART=token)
+        self.assertEqual(sorted(item['product']['title'] for item in response.data['items']), ["Atlas", "Novel"])
+        self.assertEqual(response.data['total_items'], 2)
+
+    def test_tampered_token_reads_as_empty(self):
+        self.client.post(reverse('add_to_cart'), {'product_id': self.novel.pk})
+        token = self.client.cookies['guest_cart'].value
+        response = APIClient().get(reverse('cart_count'), HTTP_X_GUEST_CART=token[:-2] + 'xx')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_guest_cart_is_merged_on_login(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.novel, quantity=1)
+        self.client.post(reverse('add_to_cart'), {'product_id': self.novel.pk, 'quantity': 2})
+        self.client.post(reverse('add_to_cart'), {'product_id': self.atlas.pk})
+
+        response = self.client.post(reverse('login'), {'email': "reader@example.com", 'password': "password123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.cookies['guest_cart'].value, '')
+        self.assertEqual(
+            dict(cart.items.values_list('product__title', 'quantity')),
+            {"Novel": 3, "Atlas": 1}
+        )
+
+    def test_guest_cart_is_merged_on_registration(self):
+        self.client.post(reverse('add_to_cart'), {'product_id': self.atlas.pk, 'quantity': 2})
+        response = self.client.post(reverse('register'), {
+            'email': "new@example.com", 'username': "newreader",
+            'password': "SecurePass123!", 'password_confirm': "SecurePass123!",
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(CartItem.objects.filter(cart__user__email="new@example.com").values_list('product_id', 'quantity')),
+            [(self.atlas.pk, 2)]
+        )
+
+
+class ReapCartsTest(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Garden")
+        self.product = Product.objects.create(title="Spade", price=25, category=category)
+        old = timezone.now() - timedelta(days=45)
+
+        def cart(name, created_at, item_updated_at=None, with_user=True):
+            user = User.objects.create_user(email=f"{name}@example.com", username=name, password="x") if with_user else None
+            cart = Cart.objects.create(user=user)
+            Cart.objects.filter(pk=cart.pk).update(created_at=created_at)
+            if item_updated_at:
+                item = CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+                CartItem.objects.filter(pk=item.pk).update(updated_at=item_updated_at)
+            return cart
+
+        self.abandoned = cart("abandoned", old, old)
+        self.empty_old = cart("empty", old)
+        self.still_active = cart("active", old, timezone.now())
+        self.orphan = cart("orphan", timezone.now(), timezone.now(), with_user=False)
+        self.fresh = cart("fresh", timezone.now())
+
+    def test_reaps_idle_and_orphaned_carts_in_batches(self):
+        out = StringIO()
+        with NamedTemporaryFile('r', suffix='.jsonl') as archive:
+            call_command('reap_carts', '--days', '30', '--batch-size', '2', '--sleep', '0',
+                         '--archive', archive.name, stdout=out)
+            archived = [json.loads(line) for line in archive]
+        self.assertEqual(
+            set(Cart.objects.values_list('pk', flat=True)),
+            {self.still_active.pk, self.fresh.pk}
+        )
+        self.assertEqual({cart['id'] for cart in archived}, {self.abandoned.pk, self.empty_old.pk, self.orphan.pk})
+        self.assertIn("Reaped 3 carts (2 items", out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        out = StringIO()
+        call_command('reap_carts', '--dry-run', stdout=out)
+        self.assertEqual(Cart.objects.count(), 5)
+        self.assertIn("Would reap 3 carts", out.getvalue())
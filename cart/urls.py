@@ -10,11 +10,13 @@ urlpatterns = [
     # Cart management
     path('', views.CartDetailView.as_view(), name='cart_detail'),
     path('add/', views.AddToCartView.as_view(), name='add_to_cart'),
+    path('batch/', views.CartBatchView.as_view(), name='cart_batch'),
     path('update/<int:item_id>/', views.UpdateCartItemView.as_view(), name='update_cart_item'),
     path('remove/<int:item_id>/', views.RemoveFromCartView.as_view(), name='remove_from_cart'),
     path('clear/', views.ClearCartView.as_view(), name='clear_cart'),
     path('count/', views.CartItemCountView.as_view(), name='cart_count'),
     path('total/', views.CartTotalView.as_view(), name='cart_total'),
+    path('summary/', views.CartSummaryView.as_view(), name='cart_summary'),
     
     # Quick actions
     path('increase/<int:item_id>/', views.IncreaseQuantityView.as_view(), name='increase_quantity'),
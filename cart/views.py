@@ -1,15 +1,37 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from .backends import DatabaseCartBackend, attach_items, get_cart_backend_class, invalidate_summary
+from .guest import GuestCartBackend, get_request_cart_backend, set_guest_token
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer, AddToCartSerializer, UpdateCartItemSerializer
+from .serializers import (
+    CartSerializer, CartItemSerializer, AddToCartSerializer, UpdateCartItemSerializer, CartBatchSerializer
+)
 from catalog.models import Product
+from catalog.trending import record_event
+from ecommerce_backend.sparse_fields import plan_queryset
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartRowsMixin:
+    """
+    Direct access to the ``Cart``/``CartItem`` rows. When the cart backend
+    keeps the live cart elsewhere (Redis) the rows are snapshots that the
+    next flush overwrites, so they are read-only; changes go through the
+    cart endpoints.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS and not get_cart_backend_class().database_is_live:
+            raise MethodNotAllowed(request.method, detail='Cart snapshots are read-only; use the cart endpoints.')
+
+
+class CartViewSet(CartRowsMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
@@ -21,8 +43,12 @@ class CartViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_summary(self.request.user.pk)
+
 
-class CartItemViewSet(viewsets.ModelViewSet):
+class CartItemViewSet(CartRowsMixin, viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
 
@@ -31,18 +57,79 @@ class CartItemViewSet(viewsets.ModelViewSet):
             return CartItem.objects.none()
         return CartItem.objects.filter(cart__user=self.request.user)
 
-
-class CartDetailView(APIView):
-    permission_classes = [IsAuthenticated]
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_summary(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_summary(self.request.user.pk)
+
+
+class CartViewMixin:
+    """
+    Cart endpoints work for signed-in users and, through a signed guest
+    token, for anonymous visitors. A changed guest cart is re-issued on
+    the response.
+    """
+    permission_classes = [AllowAny]
+
+    def get_backend(self):
+        if not hasattr(self, '_cart_backend'):
+            self._cart_backend = get_request_cart_backend(self.request)
+        return self._cart_backend
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        backend = getattr(self, '_cart_backend', None)
+        if isinstance(backend, GuestCartBackend) and backend.changed:
+            set_guest_token(response, backend)
+        return response
+
+
+def cart_data(request, backend):
+    """
+    Serialized cart in a fixed number of queries: the cart, then its items
+    with product and category joined (planned from the requested fields).
+    Totals reuse the same prefetched items.
+    """
+    context = {'request': request}
+    if isinstance(backend, DatabaseCartBackend):
+        cart = plan_queryset(Cart.objects.filter(user=request.user), CartSerializer, context).first()
+        if cart is None:
+            cart = attach_items(backend.get_cart(), [])
+    else:
+        # Guest and Redis carts come with their items, without a Cart row
+        cart = backend.get_cart()
+    return CartSerializer(cart, context=context).data
+
+
+class CartDetailView(CartViewMixin, APIView):
 
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(cart_data(request, self.get_backend()))
 
 
-class AddToCartView(APIView):
-    permission_classes = [IsAuthenticated]
+class CartBatchView(CartViewMixin, APIView):
+    """
+    Apply an ordered list of cart operations in one transaction:
+    {"operations": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}
+    Returns the resulting cart.
+    """
+
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        if serializer.is_valid():
+            operations = serializer.validated_data['operations']
+            backend = self.get_backend()
+            backend.apply(operations)
+            for product_id in {op['product_id'] for op in operations if op['op'] == 'add'}:
+                record_event('cart', product_id)
+            return Response(cart_data(request, backend))
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AddToCartView(CartViewMixin, APIView):
 
     def post(self, request):
         serializer = AddToCartSerializer(data=request.data)
@@ -51,17 +138,8 @@ class AddToCartView(APIView):
             quantity = serializer.validated_data['quantity']
             
             product = get_object_or_404(Product, id=product_id)
-            cart, created = Cart.objects.get_or_create(user=request.user)
-            
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            cart_item = self.get_backend().add(product, quantity)
+            record_event('cart', product.id)
             
             return Response(
                 CartItemSerializer(cart_item).data,
@@ -70,100 +148,68 @@ class AddToCartView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UpdateCartItemView(APIView):
-    permission_classes = [IsAuthenticated]
+class UpdateCartItemView(CartViewMixin, APIView):
 
     def patch(self, request, item_id):
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__user=request.user
-        )
-        
         serializer = UpdateCartItemSerializer(data=request.data)
         if serializer.is_valid():
-            cart_item.quantity = serializer.validated_data['quantity']
-            cart_item.save()
+            cart_item = self.get_backend().set_quantity(item_id, serializer.validated_data['quantity'])
+            if cart_item is None:
+                raise Http404
             return Response(CartItemSerializer(cart_item).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RemoveFromCartView(APIView):
-    permission_classes = [IsAuthenticated]
+class RemoveFromCartView(CartViewMixin, APIView):
 
     def delete(self, request, item_id):
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__user=request.user
-        )
-        cart_item.delete()
+        if not self.get_backend().remove(item_id):
+            raise Http404
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ClearCartView(APIView):
-    permission_classes = [IsAuthenticated]
+class ClearCartView(CartViewMixin, APIView):
 
     def delete(self, request):
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart.items.all().delete()
+        if self.get_backend().clear():
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except Cart.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class CartItemCountView(APIView):
-    permission_classes = [IsAuthenticated]
+class CartSummaryView(CartViewMixin, APIView):
+    """Item count and total in one cached call, for header badges"""
 
     def get(self, request):
-        try:
-            cart = Cart.objects.get(user=request.user)
-            count = sum(item.quantity for item in cart.items.all())
-            return Response({'count': count})
-        except Cart.DoesNotExist:
-            return Response({'count': 0})
+        return Response(self.get_backend().summary())
 
 
-class CartTotalView(APIView):
-    permission_classes = [IsAuthenticated]
+class CartItemCountView(CartViewMixin, APIView):
 
     def get(self, request):
-        try:
-            cart = Cart.objects.get(user=request.user)
-            total = sum(item.quantity * item.product.price for item in cart.items.all())
-            return Response({'total': total})
-        except Cart.DoesNotExist:
-            return Response({'total': 0})
+        return Response({'count': self.get_backend().summary()['count']})
 
 
-class IncreaseQuantityView(APIView):
-    permission_classes = [IsAuthenticated]
+class CartTotalView(CartViewMixin, APIView):
+
+    def get(self, request):
+        return Response({'total': self.get_backend().summary()['total']})
+
+
+class IncreaseQuantityView(CartViewMixin, APIView):
 
     def patch(self, request, item_id):
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__user=request.user
-        )
-        cart_item.quantity += 1
-        cart_item.save()
+        cart_item = self.get_backend().adjust(item_id, 1)
+        if cart_item is None:
+            raise Http404
         return Response(CartItemSerializer(cart_item).data)
 
 
-class DecreaseQuantityView(APIView):
-    permission_classes = [IsAuthenticated]
+class DecreaseQuantityView(CartViewMixin, APIView):
 
     def patch(self, request, item_id):
-        cart_item = get_object_or_404(
-            CartItem,
-            id=item_id,
-            cart__user=request.user
-        )
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
+        cart_item = self.get_backend().adjust(item_id, -1)
+        if cart_item is None:
+            raise Http404
+        if cart_item.quantity > 0:
             return Response(CartItemSerializer(cart_item).data)
-        else:
-            cart_item.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
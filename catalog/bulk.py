@@ -0,0 +1,268 @@
+"""
+Bulk product import and export (CSV / JSON Lines).
+
+Imports are parsed one line at a time and handled in chunks: each chunk is
+validated with the ``ProductCreateSerializer`` rules (categories resolved
+with one query per chunk), then upserted by slug with ``bulk_create`` /
+``bulk_update`` inside its own transaction, so a 50k-row file never holds
+one long transaction or the whole file in memory. Rows that fail are
+reported with their line number and never block the rest of the chunk.
+
+Exports stream the catalog with ``QuerySet.iterator()``, which uses a
+server-side cursor on PostgreSQL.
+
+``bulk_create``/``bulk_update`` skip ``save()`` and signals, so slugs are
+derived here and search vectors and catalog cache generations are
+refreshed once per chunk.
+"""
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from .cache import invalidate
+from .models import Category, Product
+from .search import update_search_vector
+from .serializers import ProductCreateSerializer
+
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+EXPORT_FIELDS = ['slug', 'title', 'description', 'price', 'category', 'stock_quantity', 'is_active']
+IMPORT_FIELDS = ['title', 'description', 'price', 'category', 'stock_quantity', 'is_active']
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def detect_format(content_type=None, filename=None, default='csv'):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    for file_format, known_type in CONTENT_TYPES.items():
+        if content_type == known_type:
+            return file_format
+    if content_type in ('application/jsonl', 'application/json-lines'):
+        return 'jsonl'
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in FORMATS:
+            return extension
+        if extension in ('ndjson', 'jsonlines'):
+            return 'jsonl'
+    return default
+
+
+def decode_lines(lines):
+    """Decode a byte line iterator as UTF-8, dropping a leading BOM"""
+    first = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_rows(lines, file_format):
+    """
+    Yield ``(line_number, row, error)`` for each record in ``lines``.
+    ``row`` is a dict of raw values, or None when the line cannot be parsed.
+    """
+    lines = decode_lines(lines)
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, row, None
+        except csv.Error as exc:
+            yield reader.line_num, None, f'Malformed CSV: {exc}'
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f'Malformed JSON: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object.'
+            continue
+        yield line_number, row, None
+
+
+class ChunkCategoryField(serializers.PrimaryKeyRelatedField):
+    """Resolve categories from the chunk's prefetched ``categories`` map"""
+
+    def to_internal_value(self, data):
+        categories = self.context.get('categories')
+        if categories is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return categories[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class ProductImportSerializer(ProductCreateSerializer):
+    slug = serializers.SlugField(max_length=255, required=False, allow_blank=True)
+    category = ChunkCategoryField(queryset=Category.objects.all())
+
+    class Meta(ProductCreateSerializer.Meta):
+        # Images are uploaded separately; everything else round-trips with export
+        fields = ['slug'] + IMPORT_FIELDS
+
+
+def clean_row(row):
+    """Drop empty optional CSV cells so serializer defaults apply"""
+    return {
+        key: value for key, value in row.items()
+        if key is not None and not (value == '' and key in ('slug', 'description', 'stock_quantity', 'is_active'))
+    }
+
+
+def category_ids(rows):
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get('category')))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, line, errors, slug=None):
+        self.errors.append({'row': line, 'slug': slug, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+def import_chunk(records, report):
+    """Validate and upsert one chunk of ``(line_number, row)`` pairs"""
+    rows = [clean_row(row) for _, row in records]
+    categories = Category.objects.in_bulk(category_ids(rows))
+    context = {'categories': categories}
+
+    # Later rows win when a file repeats a slug
+    valid = {}
+    for (line, _), row in zip(records, rows):
+        serializer = ProductImportSerializer(data=row, context=context)
+        if not serializer.is_valid():
+            report.add_error(line, serializer.errors, row.get('slug') or None)
+            continue
+        data = serializer.validated_data
+        slug = data.pop('slug', '') or slugify(data['title'])
+        if not slug:
+            report.add_error(line, {'slug': ['Could not derive a slug from the title.']})
+            continue
+        valid[slug] = (line, data)
+    if not valid:
+        return
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            existing = Product.objects.select_for_update().only('pk', 'slug', *IMPORT_FIELDS).in_bulk(
+                list(valid), field_name='slug'
+            )
+            to_create, to_update = [], []
+            for slug, (_, data) in valid.items():
+                product = existing.get(slug)
+                if product is None:
+                    to_create.append(Product(slug=slug, **data))
+                    continue
+                for field, value in data.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                to_update.append(product)
+            Product.objects.bulk_create(to_create)
+            Product.objects.bulk_update(to_update, IMPORT_FIELDS + ['updated_at'])
+            update_search_vector(Product.objects.filter(slug__in=list(valid)))
+            invalidate('product')
+    except DatabaseError as exc:
+        for slug, (line, _) in valid.items():
+            report.add_error(line, {'non_field_errors': [f'Database error: {exc}']}, slug)
+        return
+    report.created += len(to_create)
+    report.updated += len(to_update)
+
+
+def import_products(lines, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import products from an iterable of lines; returns the report dict"""
+    report = ImportReport()
+    rows = iter_rows(lines, file_format)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        records = []
+        for line, row, error in chunk:
+            if error:
+                report.add_error(line, {'non_field_errors': [error]})
+            else:
+                records.append((line, row))
+        if records:
+            import_chunk(records, report)
+    return report.as_dict()
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_rows(rows, fields, file_format):
+    """Encode dict ``rows`` as CSV (with header) or JSON Lines, one chunk per row"""
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields).encode('utf-8')
+        for row in rows:
+            yield writer.writerow([json_value(row[field]) for field in fields]).encode('utf-8')
+        return
+    for row in rows:
+        yield (json.dumps({field: row[field] for field in fields}, default=json_default) + '\n').encode('utf-8')
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Catalog rows for export; ``iterator()`` keeps memory flat"""
+    queryset = Product.objects.all() if queryset is None else queryset
+    return queryset.order_by('pk').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
@@ -0,0 +1,146 @@
+"""
+Versioned response cache for public catalog reads.
+
+Every cached response key embeds the current generation counter of each
+entity the view depends on (product, category, review). Writes never delete
+cached responses; the post_save/post_delete signals bump the generation
+instead, so stale entries simply stop being addressed and expire on their
+own. Bumps are deferred to transaction commit so a concurrent reader cannot
+cache pre-commit rows under the new generation. Bulk ``QuerySet.update()``
+calls bypass signals and must call ``invalidate`` themselves.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+
+CACHE_PREFIX = 'catalog'
+STATS_EVENTS = ('hit', 'miss')
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def generation_key(entity):
+    return f'{CACHE_PREFIX}:gen:{entity}'
+
+
+def stats_key(event):
+    return f'{CACHE_PREFIX}:stats:{event}'
+
+
+def _initial_generation():
+    # Start from the clock so an evicted counter never reuses an old value
+    return int(time.time() * 1000)
+
+
+def get_generations(entities):
+    keys = [generation_key(entity) for entity in entities]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(entity):
+    key = generation_key(entity)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_generation(), None)
+
+
+def invalidate(entity):
+    """Bump the entity generation once the current transaction commits"""
+    transaction.on_commit(lambda: bump_generation(entity))
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def record(event):
+    _increment(stats_key(event))
+
+
+def get_stats():
+    counts = cache.get_many([stats_key(event) for event in STATS_EVENTS])
+    stats = {event: counts.get(stats_key(event), 0) for event in STATS_EVENTS}
+    total = stats['hit'] + stats['miss']
+    stats['hit_ratio'] = round(stats['hit'] / total, 4) if total else 0
+    return stats
+
+
+def response_cache_key(request, entities):
+    """Key on the path, the sorted query string and the entity generations"""
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+    )
+    generations = get_generations(entities)
+    raw = repr((request.path, params, generations))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:resp:{digest}'
+
+
+def cached_payload(name, entities, build):
+    """Return ``build()``, cached under the current generations of ``entities``"""
+    generations = '.'.join(str(generation) for generation in get_generations(entities))
+    key = f'{CACHE_PREFIX}:{name}:{generations}'
+    payload = cache.get(key)
+    if payload is None:
+        record('miss')
+        payload = build()
+        cache.set(key, payload, settings.CATALOG_CACHE_TIMEOUT)
+    else:
+        record('hit')
+    return payload
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from the cache, keyed per entity generation.
+    A hit returns the stored payload without touching the ORM.
+    """
+    cache_entities = ('product', 'category', 'review')
+
+    def get(self, request, *args, **kwargs):
+        key = response_cache_key(request, self.cache_entities)
+        cached = cache.get(key)
+        if cached is not None:
+            record('hit')
+            data, validators = cached
+            response = Response(data)
+            for header, value in validators.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            # Stored validators answer conditional requests without the ORM
+            return get_conditional_response(
+                request,
+                etag=validators.get('ETag'),
+                last_modified=parse_http_date_safe(validators.get('Last-Modified')),
+                response=response,
+            )
+
+        record('miss')
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            validators = {
+                header: response[header]
+                for header in VALIDATOR_HEADERS
+                if response.has_header(header)
+            }
+            cache.set(key, (response.data, validators), settings.CATALOG_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
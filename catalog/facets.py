@@ -0,0 +1,118 @@
+"""
+Facet counts for product listings (``?facets=true``).
+
+Category counts, the price histogram and in-stock counts are folded out of
+one grouped query over the filtered queryset: rows are grouped by
+(category, price bucket, in stock) and each facet sums the groups it cares
+about. Results are cached per filter signature (path plus the filtering
+query parameters) under the product and category generations, so paging or
+re-ordering the same listing reuses them.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+from .cache import CACHE_PREFIX, get_generations
+
+
+FACETS_PARAM = 'facets'
+TRUE_VALUES = ('1', 'true', 'yes')
+# Parameters that change the page or its shape, not the rows being counted
+PRESENTATION_PARAMS = ('page', 'page_size', 'cursor', 'pagination', 'ordering', 'fields', 'expand', FACETS_PARAM)
+
+
+def facets_requested(request):
+    return request.query_params.get(FACETS_PARAM, '').lower() in TRUE_VALUES
+
+
+def price_bucket_expression(bounds):
+    return Case(
+        *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+
+
+def compute_facets(queryset, bounds=None):
+    bounds = list(settings.CATALOG_PRICE_BUCKETS if bounds is None else bounds)
+    groups = (
+        queryset.order_by()
+        .values(
+            'category_id',
+            'category__name',
+            price_bucket=price_bucket_expression(bounds),
+            in_stock=Case(
+                When(stock_quantity__gt=0, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+        .annotate(count=Count('id'))
+    )
+
+    categories = {}
+    buckets = defaultdict(int)
+    stock = {'in_stock': 0, 'out_of_stock': 0}
+    for group in groups:
+        count = group['count']
+        category = categories.setdefault(group['category_id'], {
+            'id': group['category_id'],
+            'name': group['category__name'],
+            'count': 0,
+        })
+        category['count'] += count
+        buckets[group['price_bucket']] += count
+        stock['in_stock' if group['in_stock'] else 'out_of_stock'] += count
+
+    lower_bounds = [0] + bounds
+    upper_bounds = bounds + [None]
+    return {
+        'categories': sorted(categories.values(), key=lambda c: (-c['count'], c['name'])),
+        'price': [
+            {'min': low, 'max': high, 'count': buckets[index]}
+            for index, (low, high) in enumerate(zip(lower_bounds, upper_bounds))
+        ],
+        'stock': stock,
+    }
+
+
+def facet_cache_key(request):
+    """Key on the path, the filtering query parameters and the generations"""
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        if name not in PRESENTATION_PARAMS
+        for value in request.query_params.getlist(name)
+    )
+    generations = get_generations(('product', 'category'))
+    raw = repr((request.path, params, generations))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:facets:{digest}'
+
+
+class FacetedListMixin:
+    """
+    Add a ``facets`` block next to the paginated results when the request
+    asks for it with ``?facets=true``.
+    """
+    cache_facets = True
+
+    def get_facets(self, request):
+        key = facet_cache_key(request) if self.cache_facets else None
+        if key is not None:
+            facets = cache.get(key)
+            if facets is not None:
+                return facets
+        facets = compute_facets(self.filter_queryset(self.get_queryset()))
+        if key is not None:
+            cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+        return facets
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if facets_requested(request) and isinstance(response.data, dict):
+            response.data['facets'] = self.get_facets(request)
+        return response
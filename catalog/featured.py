@@ -0,0 +1,99 @@
+"""
+Featured product ranking.
+
+``refresh_featured`` scores every active, in-stock product from three
+signals and stores the top ``limit`` in ``FeaturedProduct``:
+
+* sales volume over the last ``window_days`` (units on orders that were not
+  cancelled or failed), log-scaled against the best seller;
+* review rating, smoothed towards a neutral prior so a single 5-star
+  review does not outrank a well reviewed best seller;
+* stock depth, capped so it only breaks ties between sellable products.
+
+The featured endpoint then reads the cached ranked ids and loads them by
+primary key. Refresh periodically with ``manage.py refresh_featured_products``.
+"""
+import heapq
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import cached_payload, invalidate
+from .models import FeaturedProduct, Product
+
+
+FEATURED_LIMIT = 50
+SALES_WINDOW_DAYS = 30
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'failed')
+
+SALES_WEIGHT = 0.6
+RATING_WEIGHT = 0.3
+STOCK_WEIGHT = 0.1
+
+RATING_PRIOR_MEAN = 3
+RATING_PRIOR_COUNT = 5
+STOCK_CAP = 20
+
+
+def smoothed_rating(rating_count, rating_sum):
+    return (rating_sum + RATING_PRIOR_MEAN * RATING_PRIOR_COUNT) / (rating_count + RATING_PRIOR_COUNT)
+
+
+def score(sales, max_sales, rating_count, rating_sum, stock_quantity):
+    sales_score = math.log1p(sales) / math.log1p(max_sales) if max_sales else 0
+    rating_score = smoothed_rating(rating_count, rating_sum) / 5
+    stock_score = min(stock_quantity, STOCK_CAP) / STOCK_CAP
+    return SALES_WEIGHT * sales_score + RATING_WEIGHT * rating_score + STOCK_WEIGHT * stock_score
+
+
+def candidate_rows(window_days=SALES_WINDOW_DAYS):
+    since = timezone.now() - timedelta(days=window_days)
+    recent_sales = (
+        Q(orderitem__order__created_at__gte=since)
+        & ~Q(orderitem__order__status__in=EXCLUDED_ORDER_STATUSES)
+    )
+    return (
+        Product.objects.filter(is_active=True, stock_quantity__gt=0)
+        .annotate(sales=Coalesce(Sum('orderitem__quantity', filter=recent_sales), 0))
+        .values('id', 'sales', 'rating_count', 'rating_sum', 'stock_quantity')
+    )
+
+
+def refresh_featured(limit=FEATURED_LIMIT, window_days=SALES_WINDOW_DAYS):
+    """Recompute the ranking; returns the number of featured products stored"""
+    rows = list(candidate_rows(window_days))
+    max_sales = max((row['sales'] for row in rows), default=0)
+    scored = (
+        (score(row['sales'], max_sales, row['rating_count'], row['rating_sum'], row['stock_quantity']), row)
+        for row in rows
+    )
+    # Ties go to the older product id so the ranking is stable between runs
+    top = heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]['id']))
+
+    now = timezone.now()
+    with transaction.atomic():
+        FeaturedProduct.objects.all().delete()
+        FeaturedProduct.objects.bulk_create(
+            FeaturedProduct(
+                product_id=row['id'],
+                rank=rank,
+                score=round(value, 6),
+                sales_volume=row['sales'],
+                refreshed_at=now,
+            )
+            for rank, (value, row) in enumerate(top, start=1)
+        )
+        invalidate('featured')
+    return len(top)
+
+
+def featured_ids():
+    """Ranked product ids, cached until the next refresh"""
+    return cached_payload(
+        'featured', ('featured',),
+        lambda: list(FeaturedProduct.objects.order_by('rank').values_list('product_id', flat=True))
+    )
@@ -0,0 +1,65 @@
+"""
+Product feed for marketplaces and shopping-search partners.
+
+The feed is streamed row by row from ``QuerySet.iterator()`` (a server-side
+cursor on PostgreSQL), so memory stays flat whatever the catalog size and
+no ``COUNT(*)`` or ``OFFSET`` is ever issued. ``?updated_since=`` limits it
+to products changed since a timestamp, walking the (updated_at, id) index;
+incremental feeds include deactivated products so partners can delist
+them.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Product
+
+
+FEED_FIELDS = [
+    'id', 'slug', 'title', 'description', 'price', 'category', 'image',
+    'availability', 'stock_quantity', 'is_active', 'updated_at',
+]
+FEED_CHUNK_SIZE = 2000
+
+
+def parse_since(value):
+    """Aware datetime from an ISO timestamp or date; None if unparseable"""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def feed_queryset(updated_since=None):
+    queryset = Product.objects.all()
+    if updated_since is None:
+        queryset = queryset.filter(is_active=True)
+        ordering = ['id']
+    else:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+        ordering = ['updated_at', 'id']
+    return queryset.order_by(*ordering).values(
+        'id', 'slug', 'title', 'description', 'price', 'category__name', 'image',
+        'stock_quantity', 'is_active', 'updated_at',
+    )
+
+
+def feed_rows(queryset, request=None, chunk_size=FEED_CHUNK_SIZE):
+    storage = Product._meta.get_field('image').storage
+    for row in queryset.iterator(chunk_size=chunk_size):
+        image = row['image']
+        if image:
+            image = storage.url(image)
+            if request is not None:
+                image = request.build_absolute_uri(image)
+        row['category'] = row.pop('category__name')
+        row['image'] = image or None
+        row['availability'] = 'in_stock' if row['stock_quantity'] > 0 else 'out_of_stock'
+        yield row
@@ -0,0 +1,160 @@
+"""
+Product image derivatives.
+
+Every uploaded ``Product.image`` gets one resized copy per width in
+``settings.CATALOG_IMAGE_WIDTHS``, each in the original's family (JPEG, or
+PNG when the upload has transparency) and as WebP, stored beside the
+original as ``<name>_<width>w.<ext>``. Widths larger than the upload are
+not upscaled.
+
+Generation never runs on the request path: saving a product with a new
+image queues it once the transaction commits, either on a small background
+thread pool (``CATALOG_IMAGE_PIPELINE = 'thread'``) or for the
+``process_product_images`` management command to pick up
+(``'command'``). The command also backfills existing images.
+
+``Product.image_variants`` records the image name the variants were built
+from, so a replaced image is served without stale variants until its own
+are ready. An image that cannot be decoded or resized is recorded as
+``{'source': name, 'error': ...}`` and not retried until it is replaced
+(or the command runs with ``--force``).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+WEBP_OPTIONS = {'quality': 80, 'method': 4}
+JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': True}
+
+_executor = None
+
+
+def needs_variants(product):
+    """True when the product's current image has no variants yet"""
+    name = product.image.name if product.image else ''
+    return bool(name) and (product.image_variants or {}).get('source') != name
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def encode(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def save_beside(storage, name, content):
+    # Derivatives are rebuilt in place rather than renamed on collision
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def render_variants(name, storage, widths=None):
+    """Write the derivatives of ``name`` and return the ``image_variants`` payload"""
+    widths = settings.CATALOG_IMAGE_WIDTHS if widths is None else widths
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    transparent = has_alpha(original)
+    original = original.convert('RGBA' if transparent else 'RGB')
+    fallback = ('PNG', 'png', {'optimize': True}) if transparent else ('JPEG', 'jpg', JPEG_OPTIONS)
+    stem = os.path.splitext(name)[0]
+
+    sizes = {}
+    for width in sorted(widths):
+        image = original
+        if image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+        format, extension, options = fallback
+        sizes[str(width)] = {
+            'src': save_beside(storage, f'{stem}_{width}w.{extension}', encode(image, format, **options)),
+            'webp': save_beside(storage, f'{stem}_{width}w.webp', encode(image, 'WEBP', **WEBP_OPTIONS)),
+        }
+    return {'source': name, 'sizes': sizes}
+
+
+def process_product(product, force=False):
+    """Build variants for ``product``'s image; returns True when they were written"""
+    if not product.image or not (force or needs_variants(product)):
+        return False
+    name = product.image.name
+    try:
+        variants = render_variants(name, product.image.storage)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning(f"Could not build image variants for product {product.pk} ({name}): {exc}")
+        # Mark this source as failed so saves and --watch passes skip it
+        Product.objects.filter(pk=product.pk, image=name).update(
+            image_variants={'source': name, 'error': str(exc)}
+        )
+        return False
+
+    # Only attach them if the image was not replaced meanwhile; update()
+    # skips auto_now and signals, so bump updated_at and the cache here
+    updated = Product.objects.filter(pk=product.pk, image=name).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        invalidate('product')
+    return bool(updated)
+
+
+def process_product_id(product_id):
+    try:
+        product = Product.objects.only('pk', 'image', 'image_variants').filter(pk=product_id).first()
+        if product is not None:
+            process_product(product)
+    except Exception:
+        logger.exception(f"Image variant job failed for product {product_id}")
+    finally:
+        # Worker threads own their connections
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-images')
+    return _executor
+
+
+def schedule(product_id):
+    """Queue variant generation for a product once the current transaction commits"""
+    if settings.CATALOG_IMAGE_PIPELINE != 'thread':
+        # Left for `manage.py process_product_images`
+        return
+    transaction.on_commit(lambda: get_executor().submit(process_product_id, product_id))
+
+
+def variant_urls(image_name, variants, request=None):
+    """Per-width URLs for the serializer; empty until the variants are built"""
+    if not image_name or not variants or variants.get('source') != image_name:
+        return {}
+    storage = Product._meta.get_field('image').storage
+
+    def url(path):
+        url = storage.url(path)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        width: {kind: url(path) for kind, path in files.items()}
+        for width, files in variants.get('sizes', {}).items()
+    }
@@ -0,0 +1,113 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from catalog.models import Category, Product
+from catalog.serializers import CategorySerializer, ProductSerializer
+from ecommerce_backend.compiled import compile_serializer
+from ecommerce_backend.renderers import ORJSONRenderer
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer
+from reviews.models import Review
+from reviews.serializers import ReviewSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the per-row cost of the DRF serializers against the compiled '
+        'read-only path, and of the stdlib JSON renderer against orjson. '
+        'Sample rows are created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per model (default: 1000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case, best is kept (default: 5)')
+
+    def handle(self, *args, **options):
+        rows, self.repeat = options['rows'], options['repeat']
+        self.request = Request(APIRequestFactory().get('/api/v1/'))
+        context = {'request': self.request}
+
+        with transaction.atomic():
+            self.create_sample_data(rows)
+            cases = [
+                (ProductSerializer, Product.objects.select_related('category').order_by('id')),
+                (CategorySerializer, Category.objects.with_product_stats().order_by('id')),
+                (OrderSerializer, Order.objects.select_related('user').prefetch_related(
+                    'items__product__category').order_by('id')),
+                (ReviewSerializer, Review.objects.select_related('user', 'product').order_by('id')),
+            ]
+            self.stdout.write(f"{'serializer':<20}{'rows':>8}{'drf us/row':>14}{'compiled us/row':>18}{'speedup':>10}")
+            for serializer_class, queryset in cases:
+                count = queryset.count()
+                drf = self.best(lambda: serializer_class(queryset.all(), many=True, context=context).data)
+                plan = compile_serializer(serializer_class, context)
+                compiled = self.best(lambda: plan.serialize(plan.values(queryset.all()), self.request))
+                self.report(serializer_class.__name__, count, drf, compiled)
+
+            data = ProductSerializer(cases[0][1], many=True, context=context).data
+            stdlib = self.best(lambda: JSONRenderer().render(data))
+            fast = self.best(lambda: ORJSONRenderer().render(data))
+            self.report('render products', len(data), stdlib, fast)
+            transaction.set_rollback(True)
+
+    def best(self, function):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def report(self, label, count, baseline, candidate):
+        per_row = lambda seconds: seconds / max(count, 1) * 1e6
+        speedup = baseline / candidate if candidate else float('inf')
+        self.stdout.write(
+            f"{label:<20}{count:>8}{per_row(baseline):>14.1f}{per_row(candidate):>18.1f}{speedup:>9.1f}x"
+        )
+
+    def create_sample_data(self, rows):
+        user = User.objects.create_user(
+            email='benchmark@example.com', username='benchmark', password='benchmark'
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f'Benchmark category {i}', slug=f'benchmark-category-{i}')
+            for i in range(max(rows // 50, 1))
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                title=f'Benchmark product {i}',
+                slug=f'benchmark-product-{i}',
+                description='Benchmark product description',
+                price=Decimal('9.99') + i,
+                stock_quantity=i % 20,
+                category=categories[i % len(categories)],
+                rating_count=i % 7,
+                rating_sum=(i % 7) * 4,
+            )
+            for i in range(rows)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=user, total_amount=Decimal('29.97')) for _ in range(rows)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product=products[(i + line) % len(products)],
+                quantity=1,
+                unit_price=Decimal('9.99'),
+                subtotal=Decimal('9.99'),
+            )
+            for i, order in enumerate(orders)
+            for line in range(3)
+        )
+        Review.objects.bulk_create(
+            Review(user=user, product=product, rating=4, comment='Benchmark review')
+            for product in products
+        )
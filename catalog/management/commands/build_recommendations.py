@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.recommendations import CHUNK_ORDERS, TOP_K, update_cooccurrence
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold new orders into the product co-occurrence matrix and re-rank '
+        '"frequently bought together" for the affected products'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Discard the stored matrix and rebuild it from every order'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_ORDERS,
+            help=f'Orders merged per transaction (default: {CHUNK_ORDERS})'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help=f'Recommendations kept per product (default: {TOP_K})'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['top_k'] <= 0:
+            raise CommandError('--chunk-size and --top-k must be positive')
+        orders, products = update_cooccurrence(
+            full=options['full'], chunk_size=options['chunk_size'], top_k=options['top_k']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {orders} orders, re-ranked {products} products"
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import bulk
+
+
+class Command(BaseCommand):
+    help = 'Stream every product to a CSV or JSON Lines file (default: stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file, or - for stdout')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=bulk.FORMATS,
+            help='File format (default: from the file extension, else csv)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per round trip from the database cursor (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or bulk.detect_format(filename=path)
+        chunks = bulk.stream_rows(
+            bulk.export_rows(chunk_size=options['chunk_size']), bulk.EXPORT_FIELDS, file_format
+        )
+
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
+            return
+        try:
+            with open(path, 'wb') as target:
+                for chunk in chunks:
+                    target.write(chunk)
+        except OSError as exc:
+            raise CommandError(f"Cannot write {path}: {exc}")
+        self.stderr.write(self.style.SUCCESS(f"Exported products to {path}"))
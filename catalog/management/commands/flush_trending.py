@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.trending import flush_trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold the buffered product view and add-to-cart counters into the '
+        'decayed trending score'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and flush every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between flushes in --watch mode (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = flush_trending()
+            self.stdout.write(self.style.SUCCESS(f"Updated trending scores for {updated} products"))
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
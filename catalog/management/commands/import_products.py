@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import bulk
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by slug from a CSV or JSON Lines file (use - for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - to read stdin')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=bulk.FORMATS,
+            help='File format (default: from the file extension, else csv)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=bulk.DEFAULT_CHUNK_SIZE,
+            help=f'Rows validated and written per transaction (default: {bulk.DEFAULT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or bulk.detect_format(filename=path)
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        if path == '-':
+            report = bulk.import_products(sys.stdin.buffer, file_format, options['chunk_size'])
+        else:
+            try:
+                with open(path, 'rb') as source:
+                    report = bulk.import_products(source, file_format, options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(f"Cannot read {path}: {exc}")
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported products: {report['created']} created, "
+            f"{report['updated']} updated, {report['failed']} failed"
+        ))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.images import needs_variants, process_product
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Build thumbnail and WebP derivatives for product images that do not '
+        'have them yet (backfill), or for every image with --force'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild derivatives even when they are up to date'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Products read per database round trip (default: 500)'
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and process new uploads (worker mode)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between passes in --watch mode (default: 30)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed, failed = self.process_pending(options['force'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Built image variants for {processed} products ({failed} failed)"
+            ))
+            if not options['watch']:
+                return
+            options['force'] = False
+            time.sleep(options['interval'])
+
+    def process_pending(self, force, batch_size):
+        products = (
+            Product.objects.exclude(image='').exclude(image__isnull=True)
+            .only('pk', 'image', 'image_variants')
+            .order_by('pk')
+        )
+        processed = failed = 0
+        for product in products.iterator(chunk_size=batch_size):
+            if not (force or needs_variants(product)):
+                continue
+            if process_product(product, force=force):
+                processed += 1
+            else:
+                failed += 1
+        return processed, failed
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from catalog.featured import FEATURED_LIMIT, SALES_WINDOW_DAYS, refresh_featured
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the featured product ranking from recent sales, ratings and stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=FEATURED_LIMIT,
+            help=f'Number of ranked products kept (default: {FEATURED_LIMIT})'
+        )
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            default=SALES_WINDOW_DAYS,
+            help=f'Days of order history counted as recent sales (default: {SALES_WINDOW_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        count = refresh_featured(limit=options['limit'], window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {count} featured products"))
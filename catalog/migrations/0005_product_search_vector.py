@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class PostgresOnlyAddIndex(migrations.AddIndex):
+    """GIN indexes only exist on PostgreSQL; other backends keep the state change only."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def backfill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        """
+        UPDATE catalog_product AS p
+        SET search_vector =
+            setweight(to_tsvector('english', coalesce(p.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(c.name, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(p.description, '')), 'C')
+        FROM catalog_category AS c
+        WHERE c.id = p.category_id
+        """
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgresOnlyAddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='catalog_pro_price_2d2a4c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='catalog_pro_created_92b554_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='catalog_pro_price_01671e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='catalog_pro_created_da1d60_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['title', 'id'], name='catalog_pro_title_272735_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='catalog_pro_categor_0b778a_idx'),
+        ),
+    ]
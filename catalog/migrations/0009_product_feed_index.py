@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='catalog_pro_updated_ee0b6a_idx'),
+        ),
+    ]
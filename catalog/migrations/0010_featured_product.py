@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_product_feed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeaturedProduct',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='featured_rank', serialize=False, to='catalog.product')),
+                ('rank', models.PositiveIntegerField(unique=True)),
+                ('score', models.FloatField()),
+                ('sales_volume', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    # Existing categories are all roots
+    Category = apps.get_model('catalog', 'Category')
+    for pk in Category.objects.values_list('pk', flat=True).iterator():
+        Category.objects.filter(pk=pk).update(path=f'{pk:06d}/', depth=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_featured_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='catalog.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
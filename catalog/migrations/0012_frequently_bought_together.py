@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CooccurrenceWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FrequentlyBoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='catalog.product')),
+            ],
+            options={
+                'ordering': ['product', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='unique_bought_together_rank')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'other'), name='unique_product_cooccurrence')],
+            },
+        ),
+    ]
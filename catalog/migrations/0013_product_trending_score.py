@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_frequently_bought_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['trending_score', 'id'], name='catalog_pro_trendin_7ab3ee_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_product_trending_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='catalog.category'),
+        ),
+    ]
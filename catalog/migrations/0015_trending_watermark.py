@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_protect_category_parent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flushed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
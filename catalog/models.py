@@ -1,21 +1,83 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Q, Value
+from django.db.models.functions import Concat, Now, Substr
 from django.utils.text import slugify
 
 
+class CategoryQuerySet(models.QuerySet):
+    def with_product_stats(self):
+        """Annotate active product count and price range in the same query"""
+        active = Q(products__is_active=True)
+        return self.annotate(
+            products_count=Count('products', filter=active),
+            min_price=Min('products__price', filter=active),
+            max_price=Max('products__price', filter=active),
+        )
+
+
 class Category(models.Model):
+    PATH_SEGMENT_WIDTH = 6
+
     name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # PROTECT: deleting a department must not silently take its subtree and their products with it
+    parent = models.ForeignKey(
+        'self', on_delete=models.PROTECT, null=True, blank=True, related_name='children'
+    )
+    # Materialized path of zero-padded ancestor ids ending with our own,
+    # e.g. "000001/000007/"; maintained by save()
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Categories"
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'path%'
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super(Category, self).save(*args, **kwargs)
+        if self.parent_id is not None and self.path and self.parent.path.startswith(self.path):
+            raise ValueError("A category cannot be moved under itself or its descendants.")
+        with transaction.atomic():
+            super(Category, self).save(*args, **kwargs)
+            self.update_path()
+
+    def update_path(self):
+        """Set our path from the parent's and rewrite the descendants' paths after a move"""
+        parent_path = self.parent.path if self.parent_id is not None else ''
+        path = f'{parent_path}{self.pk:0{self.PATH_SEGMENT_WIDTH}d}/'
+        depth = path.count('/') - 1
+        if path == self.path:
+            return
+        old_path, old_depth = self.path, self.depth
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        if old_path:
+            # update() skips auto_now; descendants' breadcrumbs changed with the move
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (depth - old_depth),
+                updated_at=Now(),
+            )
+        self.path, self.depth = path, depth
+
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to the parent, read from the path"""
+        return [int(segment) for segment in self.path.split('/') if segment][:-1]
+
+    def get_ancestors(self):
+        return Category.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
 
     def __str__(self):
         return self.name
@@ -27,17 +89,42 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized/WebP derivatives of ``image``, maintained by catalog.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized review aggregates, maintained by reviews.signals
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    # Exponentially decayed view/add-to-cart score, maintained by catalog.trending
+    trending_score = models.FloatField(default=0, editable=False)
+
+    # Weighted full-text document, maintained by catalog.signals (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         indexes = [
-            models.Index(fields=['price']),
-            models.Index(fields=['created_at']),
+            # Composite (column, id) indexes back keyset pagination
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
             models.Index(fields=['category']),
+            models.Index(fields=['category', 'created_at', 'id']),
+            # Incremental product feed (?updated_since=)
+            models.Index(fields=['updated_at', 'id']),
+            # /products/trending/
+            models.Index(fields=['trending_score', 'id']),
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
         ]
         ordering = ['-created_at']
 
@@ -53,3 +140,80 @@ class Product(models.Model):
     def inventory(self):
         """Backward compatibility property"""
         return self.stock_quantity
+
+    @staticmethod
+    def compute_average_rating(rating_count, rating_sum):
+        if not rating_count:
+            return 0
+        return round(rating_sum / rating_count, 2)
+
+    @property
+    def average_rating(self):
+        """Average review rating read from the denormalized columns"""
+        return self.compute_average_rating(self.rating_count, self.rating_sum)
+
+    @property
+    def rating_distribution(self):
+        """Per-star review counts keyed by the star as a string"""
+        return {str(i): getattr(self, f'rating_{i}_count') for i in range(1, 6)}
+
+
+class FeaturedProduct(models.Model):
+    """
+    Precomputed featured ranking, rebuilt by catalog.featured.refresh_featured().
+    Holds only the top ranked products, so reads never sort the catalog.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='featured_rank'
+    )
+    rank = models.PositiveIntegerField(unique=True)
+    score = models.FloatField()
+    sales_volume = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.product_id}"
+
+
+class ProductCooccurrence(models.Model):
+    """
+    Sparse item-item co-occurrence matrix built from order baskets by
+    catalog.recommendations. Each pair is stored in both directions; the
+    diagonal (product == other) counts the baskets containing the product.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_cooccurrence'),
+        ]
+
+
+class FrequentlyBoughtTogether(models.Model):
+    """Top-K co-purchased products per product, ranked by cosine similarity"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_bought_together_rank'),
+        ]
+
+
+class CooccurrenceWatermark(models.Model):
+    """Single row recording the last order folded into ProductCooccurrence"""
+    last_order_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TrendingWatermark(models.Model):
+    """Single row recording when trending scores were last decayed"""
+    flushed_at = models.DateTimeField(null=True, blank=True)
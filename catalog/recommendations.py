@@ -0,0 +1,199 @@
+"""
+"Frequently bought together" recommendations from order history.
+
+``update_cooccurrence`` streams ``OrderItem`` rows in order-id order, groups
+them into baskets and accumulates each chunk of baskets into a sparse
+(row, column) -> count map, the dict equivalent of a COO matrix whose
+duplicate entries are summed. Each chunk is merged into the stored
+``ProductCooccurrence`` matrix and the watermark is advanced in the same
+transaction, so a run can stop at any point and the next one resumes with
+only the orders it has not counted yet. The watermark row is locked while a
+chunk is merged; a run that finds it moved by a concurrent run stops
+instead of counting the same orders twice.
+A ``full`` rebuild runs in one transaction, so the previous matrix and
+rankings stay visible until the new ones replace them.
+
+Only the rows of products touched by a run, and of their neighbours (whose
+scores use the touched products' counts), are re-ranked: their neighbours
+are scored by cosine similarity, ``c(a, b) / sqrt(n(a) * n(b))``, where the
+diagonal holds ``n``, and the best ``top_k`` replace the product's rows in
+``FrequentlyBoughtTogether``.
+"""
+import math
+from collections import Counter
+from datetime import timedelta
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from .cache import cached_payload, invalidate
+from .models import CooccurrenceWatermark, FrequentlyBoughtTogether, ProductCooccurrence
+
+
+TOP_K = 10
+CHUNK_ORDERS = 5000
+MIN_COUNT = 1
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'failed')
+# Orders younger than this may still have uncommitted siblings with lower ids
+SETTLE_DELAY = timedelta(minutes=5)
+
+
+def basket_stream(after_order_id, up_to_order_id, chunk_size):
+    """Yield (order_id, {product ids}) for the orders in (after, up_to]"""
+    rows = (
+        OrderItem.objects.filter(order_id__gt=after_order_id, order_id__lte=up_to_order_id)
+        .exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    for order_id, items in groupby(rows, key=itemgetter(0)):
+        yield order_id, {product_id for _, product_id in items}
+
+
+def count_pairs(baskets):
+    """Sparse co-occurrence counts of a chunk of baskets, both directions plus diagonal"""
+    counts = Counter()
+    for basket in baskets:
+        for product_id in basket:
+            counts[product_id, product_id] += 1
+        for a, b in combinations(sorted(basket), 2):
+            counts[a, b] += 1
+            counts[b, a] += 1
+    return counts
+
+
+def merge_counts(counts):
+    """Add ``counts`` to the stored matrix; returns the product ids whose rows changed"""
+    products = {a for a, _ in counts}
+    existing = {
+        (row.product_id, row.other_id): row
+        for row in ProductCooccurrence.objects.filter(product_id__in=products, other_id__in=products)
+    }
+    to_create, to_update = [], []
+    for (a, b), count in counts.items():
+        row = existing.get((a, b))
+        if row is None:
+            to_create.append(ProductCooccurrence(product_id=a, other_id=b, count=count))
+        else:
+            row.count += count
+            to_update.append(row)
+    ProductCooccurrence.objects.bulk_create(to_create, batch_size=1000)
+    ProductCooccurrence.objects.bulk_update(to_update, ['count'], batch_size=1000)
+    return products
+
+
+def rank_neighbours(product_ids, top_k=TOP_K, min_count=MIN_COUNT):
+    """Rebuild the top-K rows of ``product_ids`` from the stored matrix"""
+    product_ids = list(product_ids)
+    rows = list(
+        ProductCooccurrence.objects.filter(product_id__in=product_ids, count__gte=min_count)
+        .values_list('product_id', 'other_id', 'count')
+    )
+    others = {other for _, other, _ in rows}
+    totals = dict(
+        ProductCooccurrence.objects.filter(product_id__in=others | set(product_ids), other_id=F('product_id'))
+        .values_list('product_id', 'count')
+    )
+
+    neighbours = {product_id: [] for product_id in product_ids}
+    for product_id, other_id, count in rows:
+        if other_id == product_id:
+            continue
+        norm = math.sqrt(totals.get(product_id, 0) * totals.get(other_id, 0))
+        if norm:
+            neighbours[product_id].append((count / norm, count, other_id))
+
+    with transaction.atomic():
+        FrequentlyBoughtTogether.objects.filter(product_id__in=product_ids).delete()
+        FrequentlyBoughtTogether.objects.bulk_create(
+            [
+                FrequentlyBoughtTogether(product_id=product_id, recommended_id=other_id, rank=rank, score=round(score, 6))
+                for product_id, candidates in neighbours.items()
+                # Ties favour the pair seen together more often, then the older product
+                for rank, (score, _, other_id) in enumerate(
+                    sorted(candidates, key=lambda c: (-c[0], -c[1], c[2]))[:top_k], start=1
+                )
+            ],
+            batch_size=1000,
+        )
+        invalidate('recommendations')
+
+
+def update_cooccurrence(full=False, chunk_size=CHUNK_ORDERS, top_k=TOP_K):
+    """
+    Fold orders placed since the last run into the matrix (everything with
+    ``full``) and re-rank the affected products. Returns (orders, products).
+    """
+    CooccurrenceWatermark.objects.get_or_create(pk=1)
+    if not full:
+        return fold_orders(chunk_size, top_k)
+
+    # One transaction: readers keep the previous matrix and rankings until the
+    # rebuild commits, and the locked watermark holds incremental runs back
+    with transaction.atomic():
+        watermark = CooccurrenceWatermark.objects.select_for_update().get(pk=1)
+        ProductCooccurrence.objects.all().delete()
+        FrequentlyBoughtTogether.objects.all().delete()
+        watermark.last_order_id = 0
+        watermark.save()
+        invalidate('recommendations')
+        return fold_orders(chunk_size, top_k)
+
+
+def fold_orders(chunk_size, top_k):
+    watermarks = CooccurrenceWatermark.objects.select_for_update()
+    counted = CooccurrenceWatermark.objects.get(pk=1).last_order_id
+    up_to = Order.objects.filter(created_at__lt=timezone.now() - SETTLE_DELAY).aggregate(last=Max('id'))['last']
+    if up_to is None or up_to <= counted:
+        return 0, 0
+
+    orders = 0
+    touched = set()
+    baskets = basket_stream(counted, up_to, chunk_size)
+    while True:
+        chunk = list(islice(baskets, chunk_size))
+        if not chunk:
+            break
+        counts = count_pairs(basket for _, basket in chunk)
+        with transaction.atomic():
+            watermark = watermarks.get(pk=1)
+            if watermark.last_order_id != counted:
+                # A concurrent run already counted these orders
+                break
+            touched |= merge_counts(counts)
+            watermark.last_order_id = counted = chunk[-1][0]
+            watermark.save(update_fields=['last_order_id', 'updated_at'])
+        orders += len(chunk)
+
+    # Orders skipped as cancelled still move the watermark, unless another run moved it
+    CooccurrenceWatermark.objects.filter(pk=1, last_order_id=counted).update(last_order_id=up_to)
+
+    # A changed diagonal changes the cosine norm of every neighbour's scores too
+    touched = sorted(touched)
+    affected = set(touched)
+    for start in range(0, len(touched), chunk_size):
+        affected.update(
+            ProductCooccurrence.objects.filter(other_id__in=touched[start:start + chunk_size])
+            .values_list('product_id', flat=True)
+        )
+    affected = sorted(affected)
+    for start in range(0, len(affected), chunk_size):
+        rank_neighbours(affected[start:start + chunk_size], top_k=top_k)
+    return orders, len(affected)
+
+
+def bought_together_ids(product_id):
+    """Ranked recommendation ids for a product, cached until the next run"""
+    return cached_payload(
+        f'bought-together:{product_id}', ('recommendations',),
+        lambda: list(
+            FrequentlyBoughtTogether.objects.filter(product_id=product_id)
+            .order_by('rank').values_list('recommended_id', flat=True)
+        )
+    )
@@ -0,0 +1,80 @@
+"""
+Product search backends.
+
+PostgreSQL uses the stored, weighted ``Product.search_vector`` column (GIN
+indexed) with websearch-style query parsing, rank ordering and highlighted
+snippets. Other databases (SQLite in local and test runs) fall back to
+``icontains`` matching.
+"""
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Category
+
+
+SEARCH_CONFIG = 'english'
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def product_search_vector():
+    """Weighted document: title (A), category name (B), description (C)"""
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+    )
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(queryset):
+    """Recompute the stored search vector for every product in ``queryset``"""
+    if not is_postgres():
+        return 0
+    return queryset.update(search_vector=product_search_vector())
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, query, headline=True):
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        queryset = (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', 'id')
+        )
+        if headline:
+            # ts_headline re-parses the document, so skip it unless requested
+            queryset = queryset.annotate(headline=SearchHeadline(
+                'description',
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel='<mark>',
+                stop_sel='</mark>',
+                max_fragments=2,
+            ))
+        return queryset
+
+
+class IcontainsSearchBackend:
+    def search(self, queryset, query, headline=True):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+
+
+def get_search_backend():
+    if is_postgres():
+        return PostgresSearchBackend()
+    return IcontainsSearchBackend()
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from django.db.models import Avg
+from .cache import cached_payload
+from .images import variant_urls
 from .models import Product, Category
+from ecommerce_backend.sparse_fields import SparseFieldsetMixin
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -8,14 +10,53 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'products_count']
+        fields = ['id', 'name', 'slug', 'description', 'parent', 'depth', 'products_count']
+        read_only_fields = ['depth']
+        # Views list Category.objects.with_product_stats()
+        compiled_fields = {
+            'products_count': (['products_count'], None),
+        }
 
     def get_products_count(self, obj):
-        return obj.products.count()
+        count = getattr(obj, 'products_count', None)
+        if count is None:
+            count = obj.products.filter(is_active=True).count()
+        return count
 
+    def validate_parent(self, value):
+        if value is not None and self.instance is not None and self.instance.path \
+                and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be moved under itself or its descendants.")
+        return value
+
+
+class CategoryDetailSerializer(CategorySerializer):
+    breadcrumbs = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['breadcrumbs']
 
-class ProductSerializer(serializers.ModelSerializer):
+    def get_breadcrumbs(self, obj):
+        """Root-to-self chain, cached until any category changes"""
+        return cached_payload(f'breadcrumbs:{obj.pk}', ('category',), lambda: [
+            {'id': category.id, 'name': category.name, 'slug': category.slug}
+            for category in [*obj.get_ancestors(), obj]
+        ])
+
+
+class CategoryTreeSerializer(serializers.ModelSerializer):
+    products_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'parent', 'products_count', 'min_price', 'max_price']
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    image_variants = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     reviews_count = serializers.SerializerMethodField()
 
@@ -23,16 +64,39 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'title', 'slug', 'description', 'price', 'category', 
-            'category_name', 'image', 'stock_quantity', 'created_at', 
+            'category_name', 'image', 'image_variants', 'stock_quantity', 'created_at', 
             'updated_at', 'average_rating', 'reviews_count'
         ]
+        sparse_sources = {
+            'image_variants': ['image', 'image_variants'],
+            'average_rating': ['rating_count', 'rating_sum'],
+            'reviews_count': ['rating_count'],
+        }
+        compiled_fields = {
+            'image_variants': (['image', 'image_variants'], variant_urls, True),
+            'average_rating': (['rating_count', 'rating_sum'], Product.compute_average_rating),
+            'reviews_count': (['rating_count'], None),
+        }
+
+    def get_image_variants(self, obj):
+        """Per-width {'src', 'webp'} URLs; empty until the derivatives are built"""
+        return variant_urls(obj.image.name if obj.image else None, obj.image_variants, self.context.get('request'))
 
     def get_average_rating(self, obj):
-        avg_rating = obj.reviews.aggregate(Avg('rating'))['rating__avg']
-        return round(avg_rating, 2) if avg_rating else 0
+        return obj.average_rating
 
     def get_reviews_count(self, obj):
-        return obj.reviews.count()
+        return obj.rating_count
+
+
+class ProductSearchResultSerializer(ProductSerializer):
+    rank = serializers.FloatField(read_only=True, default=None)
+    headline = serializers.CharField(read_only=True, default=None)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['rank', 'headline']
+        # Search annotations, not columns
+        sparse_sources = {**ProductSerializer.Meta.sparse_sources, 'rank': [], 'headline': []}
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Product
+from .search import update_search_vector
+from .cache import invalidate
+from . import images
+
+
+SEARCH_FIELDS = {'title', 'description', 'category'}
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_search_vector(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not images.needs_variants(instance):
+        return
+    images.schedule(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    update_search_vector(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, **kwargs):
+    invalidate('product')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    invalidate('category')
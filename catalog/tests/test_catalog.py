@@ -1,5 +1,34 @@
-from django.test import TestCase
-from catalog.models import Category, Product
+import csv
+import json
+import shutil
+import tempfile
+import threading
+from base64 import b64encode
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.request import Request
+from catalog.cache import get_stats
+from users.models import User
+from catalog.models import Category, Product, ProductCooccurrence
+from catalog.serializers import CategorySerializer, ProductSerializer
+from catalog.trending import flush_trending, pending_key
+from ecommerce_backend.compiled import compile_serializer
+from ecommerce_backend.renderers import ORJSONRenderer
+from rest_framework.renderers import JSONRenderer
 from django.utils.text import slugify
 
 
@@ -41,3 +70,789 @@ class ProductModelTest(TestCase):
             category=self.category
         )
         self.assertEqual(str(product), "Mechanical Keyboard")
+
+
+class ProductSearchViewTest(APITestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio")
+        self.headphones = Product.objects.create(
+            title="Noise Cancelling Headphones",
+            description="Over-ear wireless headphones",
+            price=199.99,
+            stock_quantity=5,
+            category=self.category
+        )
+        Product.objects.create(
+            title="Desk Lamp",
+            description="LED lamp",
+            price=29.99,
+            stock_quantity=5,
+            category=Category.objects.create(name="Lighting")
+        )
+
+    def test_search_matches_title_and_category(self):
+        response = self.client.get(reverse('product_search'), {'q': 'headphones'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data['results']], [self.headphones.id])
+        self.assertIn('headline', response.data['results'][0])
+
+        response = self.client.get(reverse('product_search'), {'q': 'audio'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_empty_query_returns_nothing(self):
+        response = self.client.get(reverse('product_search'), {'q': '  '})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+
+class ProductCursorPaginationTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Stationery")
+        for i in range(45):
+            Product.objects.create(
+                title=f"Pen {i:02d}",
+                price=(i % 5) + 1,
+                stock_quantity=1,
+                category=self.category
+            )
+
+    def collect_pages(self, params):
+        url, seen = reverse('product_list'), []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(p['id'] for p in response.data['results'])
+            if not response.data['next']:
+                return seen, response
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walks_every_product_once_with_ties(self):
+        seen, _ = self.collect_pages({'pagination': 'cursor', 'ordering': '-price'})
+        expected = list(
+            Product.objects.order_by('-price', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse('product_list'), {'pagination': 'cursor', 'ordering': 'title'})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [p['id'] for p in back.data['results']],
+            [p['id'] for p in first.data['results']]
+        )
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get(reverse('product_list'), {'page': 2})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('product_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Well-formed but with a value the ordering column cannot hold
+        tampered = b64encode(json.dumps({'v': ['abc', 1]}).encode()).decode()
+        response = self.client.get(reverse('product_list'), {'cursor': tampered, 'ordering': 'price'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CatalogResponseCacheTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Cameras")
+        self.product = Product.objects.create(
+            title="Mirrorless Camera",
+            price=899.00,
+            stock_quantity=3,
+            category=self.category
+        )
+
+    def test_second_request_is_served_without_queries(self):
+        url = reverse('product_detail', kwargs={'pk': self.product.pk})
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(get_stats()['hit'], 1)
+
+    def test_query_params_are_normalized(self):
+        url = reverse('product_list')
+        self.client.get(url, {'ordering': 'price', 'page': 1})
+        response = self.client.get(f'{url}?page=1&ordering=price')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_product_save_invalidates_cached_responses(self):
+        url = reverse('product_detail', kwargs={'pk': self.product.pk})
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "Compact Camera"
+            self.product.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], "Compact Camera")
+
+
+class ConditionalGetTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Watches")
+        self.product = Product.objects.create(
+            title="Field Watch",
+            price=149.00,
+            stock_quantity=8,
+            category=self.category
+        )
+
+    def test_product_detail_returns_304_for_matching_etag(self):
+        url = reverse('product_detail', kwargs={'pk': self.product.pk})
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_response_honours_etag(self):
+        url = reverse('product_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_category_etag_changes_when_products_change(self):
+        url = reverse('category_detail', kwargs={'pk': self.category.pk})
+        etag = self.client.get(url)['ETag']
+        Product.objects.create(title="Dive Watch", price=299.00, category=self.category)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['products_count'], 2)
+
+    def test_missing_product_still_404s(self):
+        response = self.client.get(reverse('product_detail', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Furniture")
+        self.product = Product.objects.create(
+            title="Oak Desk",
+            description="A very long description " * 50,
+            price=350.00,
+            stock_quantity=2,
+            category=self.category
+        )
+
+    def test_fields_limit_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product_list'), {'fields': 'id,title,price,category_name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'title', 'price', 'category_name'}
+        )
+        select = [q['sql'] for q in queries.captured_queries if 'LIMIT' in q['sql']][-1]
+        self.assertNotIn('description', select)
+        self.assertIn('catalog_category', select)
+
+    def test_without_fields_everything_is_returned(self):
+        response = self.client.get(reverse('product_detail', kwargs={'pk': self.product.pk}))
+        self.assertIn('description', response.data)
+        self.assertIn('average_rating', response.data)
+
+
+class CompiledSerializerTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Lighting")
+        Product.objects.create(
+            title="Desk Lamp",
+            description="Adjustable desk lamp",
+            price=39.90,
+            stock_quantity=7,
+            category=self.category,
+            image="products/lamp.png",
+            rating_count=3,
+            rating_sum=11
+        )
+        Product.objects.create(
+            title="Floor Lamp",
+            description="Tall floor lamp",
+            price=89.00,
+            stock_quantity=0,
+            category=self.category
+        )
+        self.request = Request(APIRequestFactory().get('/'))
+
+    def assertCompiledMatches(self, serializer_class, queryset):
+        context = {'request': self.request}
+        expected = serializer_class(queryset, many=True, context=context).data
+        plan = compile_serializer(serializer_class, context)
+        self.assertEqual(plan.serialize(plan.values(queryset), self.request), expected)
+
+    def test_compiled_product_rows_match_serializer(self):
+        self.assertCompiledMatches(ProductSerializer, Product.objects.order_by('id'))
+
+    def test_compiled_category_rows_match_serializer(self):
+        self.assertCompiledMatches(CategorySerializer, Category.objects.with_product_stats().order_by('id'))
+
+    def test_list_endpoint_serves_compiled_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lamp = response.data['results'][0]
+        self.assertEqual(lamp['average_rating'], 3.67)
+        self.assertEqual(lamp['price'], '39.90')
+        self.assertTrue(lamp['image'].startswith('http://testserver/'))
+        # No per-row queries
+        self.assertLessEqual(len(queries), 4)
+
+    def test_orjson_renderer_matches_stdlib_renderer(self):
+        data = ProductSerializer(Product.objects.order_by('id'), many=True, context={'request': self.request}).data
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ProductFacetTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        audio = Category.objects.create(name="Speakers")
+        video = Category.objects.create(name="Cameras")
+        Product.objects.create(title="Mini Speaker", description="Pocket speaker", price=20, stock_quantity=5, category=audio)
+        Product.objects.create(title="Party Speaker", description="Loud speaker", price=120, stock_quantity=0, category=audio)
+        Product.objects.create(title="Action Camera", description="Waterproof camera", price=300, stock_quantity=1, category=video)
+
+    def test_facets_are_counted_in_one_query(self):
+        response = self.client.get(reverse('product_list'), {'facets': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        facets = response.data['facets']
+        self.assertEqual(
+            [(c['name'], c['count']) for c in facets['categories']],
+            [('Speakers', 2), ('Cameras', 1)]
+        )
+        self.assertEqual([b['count'] for b in facets['price']], [1, 0, 0, 1, 1, 0])
+        self.assertEqual(facets['stock'], {'in_stock': 2, 'out_of_stock': 1})
+
+    def test_facets_follow_filters_and_are_cached_across_pages(self):
+        params = {'facets': 'true', 'search': 'speaker'}
+        first = self.client.get(reverse('product_list'), params)
+        self.assertEqual(first.data['facets']['stock'], {'in_stock': 1, 'out_of_stock': 1})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('product_list'), {**params, 'ordering': '-price'})
+        self.assertFalse(any('GROUP BY' in q['sql'] for q in queries.captured_queries))
+
+    def test_facets_are_opt_in(self):
+        response = self.client.get(reverse('product_list'))
+        self.assertNotIn('facets', response.data)
+
+
+class CategoryProductStatsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name in ("Garden", "Kitchen", "Toys"):
+            category = Category.objects.create(name=name)
+            Product.objects.create(title=f"{name} basic", price=10, category=category)
+            Product.objects.create(title=f"{name} deluxe", price=40, category=category)
+            Product.objects.create(title=f"{name} retired", price=99, category=category, is_active=False)
+
+    def test_category_list_counts_active_products_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('category_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['products_count'] for c in response.data['results']], [2, 2, 2])
+        self.assertFalse(any('COUNT' in q['sql'] and 'WHERE' in q['sql'] and '"category_id" =' in q['sql']
+                             for q in queries.captured_queries))
+
+    def test_category_tree_is_cached_until_products_change(self):
+        tree = self.client.get(reverse('category_tree')).data
+        self.assertEqual(tree[0]['min_price'], '10.00')
+        self.assertEqual(tree[0]['max_price'], '40.00')
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('category_tree'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title="Garden hose", price=5, category=Category.objects.get(name="Garden"))
+        tree = self.client.get(reverse('category_tree')).data
+        self.assertEqual(tree[0]['products_count'], 3)
+        self.assertEqual(tree[0]['min_price'], '5.00')
+
+
+class ProductImageVariantsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CATALOG_IMAGE_WIDTHS=[160, 320])
+        self.settings_override.enable()
+        buffer = BytesIO()
+        Image.new('RGB', (480, 240), 'teal').save(buffer, 'PNG')
+        name = default_storage.save('products/poster.png', ContentFile(buffer.getvalue()))
+        self.product = Product.objects.create(
+            title="Poster",
+            price=15,
+            category=Category.objects.create(name="Prints"),
+            image=name
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_backfill_builds_resized_and_webp_variants(self):
+        self.assertEqual(self.client.get(reverse('product_list')).data['results'][0]['image_variants'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_product_images', stdout=StringIO())
+
+        self.product.refresh_from_db()
+        sizes = self.product.image_variants['sizes']
+        self.assertEqual(sorted(sizes), ['160', '320'])
+        with default_storage.open(sizes['160']['webp']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (160, 80))
+        self.assertEqual(sizes['320']['src'], 'products/poster_320w.jpg')
+
+        variants = self.client.get(reverse('product_list')).data['results'][0]['image_variants']
+        self.assertEqual(variants['320']['webp'], 'http://testserver/media/products/poster_320w.webp')
+
+    def test_replaced_image_hides_stale_variants(self):
+        call_command('process_product_images', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.product.image = 'products/missing.png'
+        self.product.save()
+        response = self.client.get(reverse('product_detail', kwargs={'pk': self.product.pk}))
+        self.assertEqual(response.data['image_variants'], {})
+
+    def test_undecodable_image_is_marked_failed_and_skipped(self):
+        name = default_storage.save('products/broken.png', ContentFile(b'not an image'))
+        self.product.image = name
+        self.product.save()
+        out = StringIO()
+        call_command('process_product_images', stdout=out)
+        self.assertIn("(1 failed)", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants['source'], name)
+        self.assertIn('error', self.product.image_variants)
+
+        out = StringIO()
+        call_command('process_product_images', stdout=out)
+        self.assertIn("for 0 products (0 failed)", out.getvalue())
+
+
+class ProductBulkImportExportTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email="catalog-admin@example.com", username="catalog_admin", password="password123", is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        self.category = Category.objects.create(name="Hardware")
+        self.existing = Product.objects.create(title="Claw Hammer", price=12, category=self.category)
+
+    def test_csv_import_upserts_by_slug_and_reports_bad_rows(self):
+        body = (
+            "slug,title,description,price,category,stock_quantity\n"
+            f"claw-hammer,Claw Hammer,Steel head,14.50,{self.category.pk},3\n"
+            f",Tape Measure,,8.00,{self.category.pk},10\n"
+            f"bad-price,Broken,,-1,{self.category.pk},1\n"
+            "no-category,Orphan,,5.00,9999,1\n"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('admin-product-bulk-import'), data=body.encode('utf-8'), content_type='text/csv'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (1, 1, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertIn('category', response.data['errors'][1]['errors'])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(str(self.existing.price), '14.50')
+        self.assertEqual(Product.objects.get(slug='tape-measure').stock_quantity, 10)
+        # One chunk: category lookup, locked slug lookup, insert, update
+        self.assertLess(len(queries), 12)
+
+    def test_jsonl_export_round_trips_through_import(self):
+        response = self.client.get(reverse('admin-product-bulk-export'), {'file_format': 'jsonl'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 1)
+
+        response = self.client.post(
+            reverse('admin-product-bulk-import'), data='\n'.join(lines), content_type='application/x-ndjson'
+        )
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (0, 1, 0))
+
+    def test_import_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('admin-product-bulk-import'), data=b'', content_type='text/csv')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    def test_management_commands_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = f'{directory}/products.csv'
+        call_command('export_products', path, stderr=StringIO())
+        Product.objects.filter(pk=self.existing.pk).update(price=1)
+
+        out = StringIO()
+        call_command('import_products', path, stdout=out, stderr=StringIO())
+        self.assertIn('0 created, 1 updated, 0 failed', out.getvalue())
+        self.existing.refresh_from_db()
+        self.assertEqual(str(self.existing.price), '12.00')
+
+
+class ProductFeedTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Outdoor")
+        self.tent = Product.objects.create(title="Tent", price=150, stock_quantity=4, category=category)
+        self.stove = Product.objects.create(title="Camp Stove", price=60, stock_quantity=0, category=category)
+        self.retired = Product.objects.create(title="Old Lantern", price=20, category=category, is_active=False)
+
+    def read_feed(self, params=None):
+        response = self.client.get(reverse('product_feed'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_full_feed_streams_active_products_as_jsonl(self):
+        response, body = self.read_feed()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ["Tent", "Camp Stove"])
+        self.assertEqual(rows[1]['availability'], 'out_of_stock')
+        self.assertEqual(rows[0]['category'], 'Outdoor')
+        self.assertEqual(rows[0]['price'], '150.00')
+        self.assertIn('X-Feed-Generated-At', response)
+
+    def test_incremental_feed_includes_changed_and_deactivated_products(self):
+        since = timezone.now()
+        Product.objects.filter(pk__in=[self.stove.pk, self.retired.pk]).update(
+            updated_at=since + timedelta(seconds=1)
+        )
+        _, body = self.read_feed({'updated_since': since.isoformat(), 'file_format': 'csv'})
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row['slug'] for row in rows], ['camp-stove', 'old-lantern'])
+        self.assertEqual(rows[1]['is_active'], 'False')
+
+    def test_invalid_updated_since_is_rejected(self):
+        response = self.client.get(reverse('product_feed'), {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FeaturedProductsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        from orders.models import Order, OrderItem
+
+        category = Category.objects.create(name="Coffee")
+        self.best_seller = Product.objects.create(title="House Blend", price=12, stock_quantity=40, category=category)
+        self.well_rated = Product.objects.create(
+            title="Single Origin", price=18, stock_quantity=5, category=category, rating_count=20, rating_sum=96
+        )
+        self.sold_out = Product.objects.create(title="Holiday Roast", price=15, stock_quantity=0, category=category)
+        self.plain = Product.objects.create(title="Decaf", price=11, stock_quantity=2, category=category)
+
+        buyer = User.objects.create_user(email="buyer@example.com", username="buyer", password="password123")
+        order = Order.objects.create(user=buyer, total_amount=150)
+        OrderItem.objects.create(order=order, product=self.best_seller, quantity=10, unit_price=12, subtotal=120)
+        OrderItem.objects.create(order=order, product=self.sold_out, quantity=50, unit_price=15, subtotal=750)
+        cancelled = Order.objects.create(user=buyer, total_amount=110, status='cancelled')
+        OrderItem.objects.create(order=cancelled, product=self.plain, quantity=10, unit_price=11, subtotal=110)
+
+    def test_refresh_ranks_sales_rating_and_stock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_featured_products', stdout=StringIO())
+        response = self.client.get(reverse('featured_products'))
+        self.assertEqual(
+            [p['title'] for p in response.data['results']],
+            ["House Blend", "Single Origin", "Decaf"]
+        )
+
+    def test_featured_endpoint_reads_ranking_by_primary_key(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_featured_products', stdout=StringIO())
+        self.client.get(reverse('featured_products'))
+        # A different query string misses the response cache but not the ranking cache
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('featured_products'), {'page': 1})
+        self.assertFalse(any('catalog_featuredproduct" ORDER BY' in q['sql'] for q in queries.captured_queries))
+
+    def test_falls_back_to_newest_before_first_refresh(self):
+        response = self.client.get(reverse('featured_products'))
+        self.assertEqual(response.data['results'][0]['title'], "Decaf")
+
+
+class FrequentlyBoughtTogetherTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Camping")
+        self.tent = Product.objects.create(title="Tent", price=200, category=category)
+        self.pegs = Product.objects.create(title="Tent Pegs", price=10, category=category)
+        self.mat = Product.objects.create(title="Sleeping Mat", price=40, category=category)
+        self.stove = Product.objects.create(title="Stove", price=60, category=category)
+        self.buyer = User.objects.create_user(email="camper@example.com", username="camper", password="password123")
+        self.place_order(self.tent, self.pegs)
+        self.place_order(self.tent, self.pegs, self.mat)
+        self.place_order(self.stove, self.mat)
+        self.place_order(self.tent, self.stove, status='cancelled')
+
+    def place_order(self, *products, status='pending', settled=True):
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(user=self.buyer, total_amount=0, status=status)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.price, subtotal=product.price)
+        if settled:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        return order
+
+    def build(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_recommendations', *args, stdout=StringIO())
+
+    def recommended(self, product):
+        response = self.client.get(reverse('frequently_bought_together', args=[product.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['title'] for p in response.data['results']]
+
+    def test_ranks_by_cosine_similarity_and_skips_cancelled_orders(self):
+        self.build()
+        self.assertEqual(self.recommended(self.tent), ["Tent Pegs", "Sleeping Mat"])
+        self.assertEqual(self.recommended(self.stove), ["Sleeping Mat"])
+
+    def test_concurrent_runs_count_each_order_once(self):
+        from catalog import recommendations
+
+        count_pairs = recommendations.count_pairs
+
+        def racing_count_pairs(baskets):
+            # Another run counts the same orders while this one is mid-chunk
+            with mock.patch.object(recommendations, 'count_pairs', count_pairs):
+                recommendations.update_cooccurrence()
+            return count_pairs(baskets)
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(recommendations, 'count_pairs', racing_count_pairs):
+            recommendations.update_cooccurrence()
+        self.assertEqual(ProductCooccurrence.objects.get(product=self.tent, other=self.pegs).count, 2)
+
+    def test_full_rebuild_keeps_rankings_until_it_commits(self):
+        from catalog import recommendations
+
+        self.build()
+        with mock.patch.object(recommendations, 'count_pairs', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            recommendations.update_cooccurrence(full=True)
+        cache.clear()
+        self.assertEqual(self.recommended(self.tent), ["Tent Pegs", "Sleeping Mat"])
+
+    def test_incremental_runs_only_count_new_orders(self):
+        self.build()
+        self.place_order(self.stove, self.tent)
+        self.place_order(self.stove, self.tent)
+        # Too recent to be counted yet
+        self.place_order(self.pegs, self.stove, settled=False)
+        self.build()
+        self.assertEqual(self.recommended(self.stove), ["Tent", "Sleeping Mat"])
+        self.assertNotIn("Stove", self.recommended(self.pegs))
+
+        incremental = self.recommended(self.tent)
+        cache.clear()
+        self.build('--full')
+        self.assertEqual(self.recommended(self.tent), incremental)
+
+    def test_incremental_runs_match_full_rebuild(self):
+        from catalog.models import FrequentlyBoughtTogether
+
+        def rankings():
+            return sorted(FrequentlyBoughtTogether.objects.values_list('product_id', 'recommended_id', 'rank', 'score'))
+
+        self.build()
+        # Only tent and stove get new baskets, but pegs and mat rank tent by its count
+        for _ in range(3):
+            self.place_order(self.tent, self.stove)
+        self.build()
+        incremental = rankings()
+        self.build('--full')
+        self.assertEqual(incremental, rankings())
+
+    def test_empty_before_first_build(self):
+        self.assertEqual(self.recommended(self.tent), [])
+
+
+class TrendingProductsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Audio")
+        self.headphones = Product.objects.create(title="Headphones", price=80, stock_quantity=5, category=category)
+        self.speaker = Product.objects.create(title="Speaker", price=120, stock_quantity=5, category=category)
+        self.cable = Product.objects.create(title="Cable", price=5, stock_quantity=5, category=category)
+        self.user = User.objects.create_user(email="listener@example.com", username="listener", password="password123")
+
+    def flush(self, now=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return flush_trending(now)
+
+    def trending(self):
+        return [p['title'] for p in self.client.get(reverse('trending_products')).data['results']]
+
+    def test_views_and_cart_adds_are_counted_off_the_request_path(self):
+        for _ in range(3):
+            self.client.get(reverse('product_detail', args=[self.headphones.pk]))
+        self.client.get(reverse('product_detail', args=[self.speaker.pk]))
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('product_detail', args=[self.speaker.pk]))
+        self.assertFalse(any('trending_score' in q['sql'] for q in queries.captured_queries))
+        self.client.post(reverse('add_to_cart'), {'product_id': self.speaker.pk, 'quantity': 1})
+
+        self.assertEqual(self.flush(), 2)
+        self.headphones.refresh_from_db()
+        self.speaker.refresh_from_db()
+        self.assertEqual(self.headphones.trending_score, 3)
+        self.assertEqual(self.speaker.trending_score, 7)
+        self.assertEqual(self.trending(), ["Speaker", "Headphones"])
+        # Counters are drained by the flush
+        self.assertEqual(self.flush(), 0)
+
+    def test_scores_decay_by_half_life(self):
+        start = timezone.now()
+        self.client.get(reverse('product_detail', args=[self.cable.pk]))
+        self.flush(start)
+        # The last flush time survives a cache restart
+        cache.clear()
+        for _ in range(2):
+            self.client.get(reverse('product_detail', args=[self.headphones.pk]))
+        with override_settings(CATALOG_TRENDING_HALF_LIFE_HOURS=1):
+            self.flush(start + timedelta(hours=2))
+        self.cable.refresh_from_db()
+        self.assertAlmostEqual(self.cable.trending_score, 0.25)
+        self.assertEqual(self.trending(), ["Headphones", "Cable"])
+
+    def test_pending_counters_are_folded_once(self):
+        # Left aside by a flush interrupted before it applied them
+        cache.set(pending_key('view'), {self.cable.pk: 4}, None)
+        self.client.get(reverse('product_detail', args=[self.cable.pk]))
+        now = timezone.now()
+        self.assertEqual(self.flush(now), 1)
+        self.assertEqual(self.flush(now), 0)
+        self.cable.refresh_from_db()
+        self.assertEqual(self.cable.trending_score, 5)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentTrendingFlushTest(TransactionTestCase):
+    """
+    Overlapping flushes (cron and --watch) over one pending hash count each
+    event once. Needs row locks (PostgreSQL).
+    """
+
+    def test_overlapping_flushes_fold_pending_counters_once(self):
+        cache.clear()
+        category = Category.objects.create(name="Vinyl")
+        record = Product.objects.create(title="Record", price=25, category=category)
+        cache.set(pending_key('view'), {record.pk: 4}, None)
+
+        barrier = threading.Barrier(2)
+
+        def flush():
+            barrier.wait()
+            try:
+                flush_trending()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=flush) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        record.refresh_from_db()
+        self.assertEqual(record.trending_score, 4)
+
+
+class CategoryHierarchyTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.electronics = Category.objects.create(name="Electronics")
+        self.computers = Category.objects.create(name="Computers", parent=self.electronics)
+        self.laptops = Category.objects.create(name="Laptops", parent=self.computers)
+        self.garden = Category.objects.create(name="Garden Tools")
+        Product.objects.create(title="TV", price=500, category=self.electronics)
+        Product.objects.create(title="Ultrabook", price=1200, category=self.laptops)
+        Product.objects.create(title="Rake", price=20, category=self.garden)
+
+    def test_paths_encode_ancestors(self):
+        self.assertEqual(self.laptops.path, f"{self.electronics.pk:06d}/{self.computers.pk:06d}/{self.laptops.pk:06d}/")
+        self.assertEqual(self.laptops.depth, 2)
+
+    def test_descendant_products_in_one_prefix_query(self):
+        url = reverse('category_products', kwargs={'pk': self.electronics.pk})
+        self.assertEqual([p['title'] for p in self.client.get(url).data['results']], ["TV"])
+        response = self.client.get(url, {'include_descendants': 'true'})
+        self.assertEqual(sorted(p['title'] for p in response.data['results']), ["TV", "Ultrabook"])
+
+    def test_moving_a_subtree_rewrites_descendant_paths(self):
+        modified = self.laptops.updated_at
+        self.computers.parent = self.garden
+        self.computers.save()
+        self.laptops.refresh_from_db()
+        self.assertGreater(self.laptops.updated_at, modified)
+        self.assertTrue(self.laptops.path.startswith(self.garden.path))
+        self.assertEqual(self.laptops.depth, 2)
+        with self.assertRaises(ValueError):
+            self.garden.parent = self.laptops
+            self.garden.save()
+
+    def test_breadcrumbs_and_nested_tree(self):
+        response = self.client.get(reverse('category_detail', kwargs={'pk': self.laptops.pk}))
+        self.assertEqual([c['name'] for c in response.data['breadcrumbs']], ["Electronics", "Computers", "Laptops"])
+
+        tree = self.client.get(reverse('category_tree')).data
+        electronics = next(node for node in tree if node['name'] == "Electronics")
+        self.assertEqual(electronics['children'][0]['children'][0]['name'], "Laptops")
+
+    def test_ancestor_rename_changes_child_etag(self):
+        url = reverse('category_detail', kwargs={'pk': self.laptops.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.electronics.name = "Consumer Electronics"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.electronics.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['breadcrumbs'][0]['name'], "Consumer Electronics")
+
+    def test_deleting_a_parent_is_refused(self):
+        admin = User.objects.create_user(
+            email="tree-admin@example.com", username="tree_admin", password="password123", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.delete(reverse('admin-category-detail', kwargs={'pk': self.electronics.pk}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Category.objects.filter(path__startswith=self.electronics.path).count(), 3)
+        self.assertTrue(Product.objects.filter(title="Ultrabook").exists())
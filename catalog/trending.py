@@ -0,0 +1,158 @@
+"""
+Trending products from write-behind view and add-to-cart counters.
+
+Requests never write to the database: ``record_event`` increments a
+per-event hash in Redis (``HINCRBY catalog:trending:<event> <product id>``).
+``flush_trending`` (run periodically with ``manage.py flush_trending``)
+moves the hashes aside with ``RENAMENX``, so increments arriving during a
+flush land in a fresh hash, then folds them into ``Product.trending_score``:
+
+    score = score * 0.5 ** (elapsed / half_life) + sum(weight * count)
+
+The decay is one set-based UPDATE over products that still have a score,
+and increments are applied with one UPDATE per distinct increment value.
+The time of the last decay is kept in ``TrendingWatermark``. A flush holds
+its row lock while it takes, applies and drops the pending counters, so
+concurrent flushes and cache restarts neither skip nor repeat a decay or
+an event.
+``/products/trending/`` reads the indexed score.
+
+Without Redis (local development) the counters are kept in the Django
+cache as one dict per event, which is not atomic across processes.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ecommerce_backend.redis_client import redis_connection
+
+from .cache import CACHE_PREFIX, invalidate
+from .models import Product, TrendingWatermark
+
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ('view', 'cart')
+# Scores decayed below this are reset to zero so they drop out of the decay pass
+MIN_SCORE = 0.01
+
+
+def counter_key(event):
+    return f'{CACHE_PREFIX}:trending:{event}'
+
+
+def pending_key(event):
+    return f'{counter_key(event)}:flushing'
+
+
+def record_event(event, product_id):
+    """Count one event for a product; failures never break the request"""
+    try:
+        connection = redis_connection()
+        if connection is not None:
+            connection.hincrby(counter_key(event), product_id, 1)
+            return
+        counts = cache.get(counter_key(event)) or {}
+        counts[product_id] = counts.get(product_id, 0) + 1
+        cache.set(counter_key(event), counts, None)
+    except Exception as exc:
+        logger.warning(f"Could not record {event} event for product {product_id}: {exc}")
+
+
+def take_counts():
+    """
+    Move the live counters aside and return ``{event: {product_id: count}}``.
+    Counters left aside by an interrupted flush are picked up again.
+    """
+    connection = redis_connection()
+    counts = {}
+    for event in EVENTS:
+        if connection is None:
+            counts[event] = Counter(cache.get(pending_key(event)) or {})
+            counts[event].update(cache.get(counter_key(event)) or {})
+            cache.set(pending_key(event), dict(counts[event]), None)
+            cache.delete(counter_key(event))
+            continue
+        if connection.exists(counter_key(event)):
+            # Fails (and leaves the live hash alone) if a previous flush left one aside
+            connection.renamenx(counter_key(event), pending_key(event))
+        counts[event] = {
+            int(product_id): int(count)
+            for product_id, count in connection.hgetall(pending_key(event)).items()
+        }
+    return counts
+
+
+def clear_taken():
+    connection = redis_connection()
+    keys = [pending_key(event) for event in EVENTS]
+    if connection is None:
+        cache.delete_many(keys)
+    else:
+        connection.delete(*keys)
+
+
+def decay_factor(elapsed):
+    half_life = settings.CATALOG_TRENDING_HALF_LIFE_HOURS * 3600
+    return 0.5 ** (max(elapsed.total_seconds(), 0) / half_life)
+
+
+def score_increments(counts):
+    weights = settings.CATALOG_TRENDING_WEIGHTS
+    increments = Counter()
+    for event, per_product in counts.items():
+        for product_id, count in per_product.items():
+            increments[product_id] += weights[event] * count
+    return increments
+
+
+def flush_trending(now=None):
+    """Decay every score and add the counted events; returns products updated"""
+    now = now or timezone.now()
+    TrendingWatermark.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        watermark = TrendingWatermark.objects.select_for_update().get(pk=1)
+        # Only the lock holder reads the pending counters, so concurrent flushes cannot fold them twice
+        increments = score_increments(take_counts())
+        by_increment = defaultdict(list)
+        for product_id, increment in increments.items():
+            by_increment[increment].append(product_id)
+
+        factor = decay_factor(now - watermark.flushed_at) if watermark.flushed_at else 1
+        if factor < 1:
+            decaying = Product.objects.filter(trending_score__gt=0)
+            decaying.update(trending_score=F('trending_score') * factor)
+            decaying.filter(trending_score__lt=MIN_SCORE).update(trending_score=0)
+        for increment, product_ids in by_increment.items():
+            Product.objects.filter(pk__in=product_ids).update(trending_score=F('trending_score') + increment)
+        watermark.flushed_at = now
+        watermark.save(update_fields=['flushed_at'])
+        invalidate('trending')
+        # Dropped before the lock is released: a flush waiting on it must find nothing pending
+        clear_taken()
+    return len(increments)
+
+
+class TrendingEventMixin:
+    """Count a trending event for the product of every successful request"""
+    trending_event = 'view'
+
+    def trending_product_id(self, response):
+        if 'pk' in self.kwargs:
+            return self.kwargs['pk']
+        data = getattr(response, 'data', None)
+        return data.get('id') if isinstance(data, dict) else None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # 304s are repeat views answered from the client's cache
+        if response.status_code in (200, 304):
+            product_id = self.trending_product_id(response)
+            if product_id is not None:
+                record_event(self.trending_event, product_id)
+        return response
@@ -11,14 +11,22 @@ admin_router.register('categories', views.CategoryViewSet, basename='admin-categ
 urlpatterns = [
     # Specific product endpoints (must come before router patterns)
     path('products/search/', views.ProductSearchView.as_view(), name='product_search'),
+    path('products/feed/', views.ProductFeedView.as_view(), name='product_feed'),
     path('products/featured/', views.FeaturedProductsView.as_view(), name='featured_products'),
     path('products/latest/', views.LatestProductsView.as_view(), name='latest_products'),
+    path('products/trending/', views.TrendingProductsView.as_view(), name='trending_products'),
     path('products/', views.ProductListView.as_view(), name='product_list'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
+    path(
+        'products/<int:pk>/frequently-bought-together/',
+        views.FrequentlyBoughtTogetherView.as_view(),
+        name='frequently_bought_together'
+    ),
     path('products/<slug:slug>/', views.ProductBySlugView.as_view(), name='product_by_slug'),
     
     # Specific category endpoints (must come before router patterns)
     path('categories/', views.CategoryListView.as_view(), name='category_list'),
+    path('categories/tree/', views.CategoryTreeView.as_view(), name='category_tree'),
     path('categories/<int:pk>/', views.CategoryDetailView.as_view(), name='category_detail'),
     path('categories/<slug:slug>/', views.CategoryBySlugView.as_view(), name='category_by_slug'),
     path('categories/<int:pk>/products/', views.CategoryProductsView.as_view(), name='category_products'),
@@ -26,6 +34,7 @@ urlpatterns = [
     # Admin endpoints - include router but disable root view, add custom secured root
     path('admin/', include([
         path('', views.admin_root, name='admin_root'),  # Custom admin root view
+        path('cache-stats/', views.cache_stats, name='admin_cache_stats'),
         path('', include(admin_router.urls)),  # ViewSet endpoints
     ])),
 ]
@@ -1,12 +1,31 @@
-from rest_framework import viewsets, filters, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import viewsets, filters, generics, status
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.reverse import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Count, Max, ProtectedError, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+from . import bulk, feed
+from .serializers import (
+    ProductSerializer,
+    ProductSearchResultSerializer,
+    CategorySerializer,
+    CategoryDetailSerializer,
+    CategoryTreeSerializer,
+)
+from .search import get_search_backend
+from .cache import CachedResponseMixin, cached_payload, get_stats
+from .facets import FacetedListMixin
+from .featured import featured_ids
+from .recommendations import bought_together_ids
+from .trending import TrendingEventMixin
+from ecommerce_backend.conditional import ConditionalGetMixin
+from ecommerce_backend.compiled import CompiledListMixin
+from ecommerce_backend.sparse_fields import SparseFieldsetViewMixin, field_requested
 from .permissions import IsAdminOrReadOnly, IsAuthenticatedAdmin
 
 
@@ -20,13 +39,77 @@ def admin_root(request, format=None):
     return Response({
         'products': reverse('admin-product-list', request=request, format=format),
         'categories': reverse('admin-category-list', request=request, format=format),
+        'cache_stats': reverse('admin_cache_stats', request=request, format=format),
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedAdmin])
+def cache_stats(request, format=None):
+    """
+    Admin-only hit/miss counters for the public catalog response cache.
+    """
+    return Response(get_stats())
+
+
+def build_category_tree():
+    """Nest the flat, path-ordered category rows under their parents"""
+    categories = Category.objects.with_product_stats().order_by('path')
+    nodes = {}
+    roots = []
+    for row in CategoryTreeSerializer(categories, many=True).data:
+        node = {**row, 'children': []}
+        nodes[node['id']] = node
+        parent = nodes.get(node['parent'])
+        (parent['children'] if parent is not None else roots).append(node)
+    return roots
+
+
+class ProductValidatorsMixin(ConditionalGetMixin):
+    # category_name is part of the product payload
+    validator_related_fields = ('category__updated_at',)
+
+
+class CategoryValidatorsMixin(ConditionalGetMixin):
+    # products_count is part of the category payload
+    validator_related_fields = ('products__updated_at',)
+
+    def get_validator_queryset(self):
+        # Aggregate over plain rows, not the annotated listing queryset
+        return self.filter_queryset(Category.objects.all())
+
+    def get_validator_aggregates(self):
+        aggregates = super().get_validator_aggregates()
+        aggregates['products_count'] = Count('products', distinct=True, filter=Q(products__is_active=True))
+        return aggregates
+
+
+class CategoryDetailValidatorsMixin(CategoryValidatorsMixin):
+    """Breadcrumbs are part of the detail payload, so ancestor changes count too"""
+
+    def get_validator_aggregates(self):
+        aggregates = super().get_validator_aggregates()
+        # A single row, so this is its path
+        aggregates['path'] = Max('path')
+        return aggregates
+
+    def get_validator_values(self, request, *args, **kwargs):
+        values = super().get_validator_values(request, *args, **kwargs)
+        if values:
+            ancestor_ids = Category(path=values['path']).ancestor_ids
+            if ancestor_ids:
+                values['ancestors_updated_at'] = Category.objects.filter(pk__in=ancestor_ids).aggregate(
+                    last_modified=Max('updated_at')
+                )['last_modified']
+        return values
+
+
 class ProductViewSet(viewsets.ModelViewSet):
     """
     Admin-only ViewSet for managing products.
     Requires authentication and staff privileges for all operations.
+    Bulk upserts go through import (CSV or JSON Lines request body) and the
+    catalog streams back out through export.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -37,18 +120,63 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering_fields = ['price', 'created_at', 'title']
     ordering = ['created_at']
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Upsert products by slug from a CSV (text/csv) or JSON Lines
+        (application/x-ndjson) request body. Returns created/updated counts
+        and per-row validation errors.
+        """
+        file_format = bulk.detect_format(
+            request.content_type, default=request.query_params.get('file_format', 'csv')
+        )
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', bulk.DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = 0
+        if chunk_size <= 0:
+            return Response({'error': 'chunk_size must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.stream is None:
+            return Response({'error': 'Request body is empty.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The body is read line by line, never loaded whole
+        report = bulk.import_products(request.stream, file_format, chunk_size=chunk_size)
+        return Response(report)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def bulk_export(self, request):
+        """Stream every product as CSV (default) or JSON Lines (?file_format=jsonl)"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in bulk.FORMATS:
+            return Response({'error': 'file_format must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            bulk.stream_rows(bulk.export_rows(), bulk.EXPORT_FIELDS, file_format),
+            content_type=bulk.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     """
     Admin-only ViewSet for managing categories.
     Requires authentication and staff privileges for all operations.
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.with_product_stats()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedAdmin]
 
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'Category has subcategories. Move or delete them first.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(CachedResponseMixin, ProductValidatorsMixin, FacetedListMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -59,70 +187,192 @@ class ProductListView(generics.ListAPIView):
     ordering = ['created_at']
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(TrendingEventMixin, CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class ProductBySlugView(generics.RetrieveAPIView):
+class ProductBySlugView(TrendingEventMixin, CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
 
 
-class ProductSearchView(generics.ListAPIView):
-    serializer_class = ProductSerializer
+class ProductSearchView(FacetedListMixin, SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Full-text product search on ?q=.
+    Ranked tsvector search on PostgreSQL, icontains matching elsewhere.
+    ?facets=true adds category, price and stock counts for the matches.
+    """
+    serializer_class = ProductSearchResultSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        query = self.request.query_params.get('q', '')
+        query = self.request.query_params.get('q', '').strip()
         if query:
-            return Product.objects.filter(
-                Q(title__icontains=query) | 
-                Q(description__icontains=query) |
-                Q(category__name__icontains=query)
+            return get_search_backend().search(
+                Product.objects.all(),
+                query,
+                headline=field_requested(self.get_serializer_context(), 'headline')
             )
         return Product.objects.none()
 
 
-class FeaturedProductsView(generics.ListAPIView):
+class ProductFeedView(APIView):
+    """
+    Streaming catalog feed for marketplace and shopping-search partners.
+    JSON Lines by default, CSV with ?file_format=csv. ?updated_since=<ISO
+    timestamp> returns only products changed since then, including
+    deactivated ones; pass the previous response's X-Feed-Generated-At.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'jsonl')
+        if file_format not in bulk.FORMATS:
+            return Response({'error': 'file_format must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+        updated_since = None
+        if request.query_params.get('updated_since'):
+            updated_since = feed.parse_since(request.query_params['updated_since'])
+            if updated_since is None:
+                return Response(
+                    {'error': 'updated_since must be an ISO 8601 date or timestamp.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Taken before reading, so the next incremental pull cannot miss rows
+        generated_at = timezone.now()
+        rows = feed.feed_rows(feed.feed_queryset(updated_since), request)
+        response = StreamingHttpResponse(
+            bulk.stream_rows(rows, feed.FEED_FIELDS, file_format),
+            content_type=bulk.CONTENT_TYPES[file_format],
+        )
+        response['X-Feed-Generated-At'] = generated_at.isoformat()
+        return response
+
+
+class FeaturedProductsView(CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
+    """
+    Top ranked products from the precomputed FeaturedProduct table
+    (see catalog.featured), loaded by primary key in rank order.
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_entities = ('product', 'category', 'review', 'featured')
+    validator_related_fields = ('category__updated_at', 'featured_rank__refreshed_at')
+    featured_limit = 10
+
+    def get_queryset(self):
+        ids = featured_ids()[:self.featured_limit]
+        if not ids:
+            # Ranking not built yet: newest products until the first refresh
+            return Product.objects.filter(is_active=True).order_by('-created_at')[:self.featured_limit]
+        return (
+            Product.objects.filter(pk__in=ids, is_active=True, stock_quantity__gt=0)
+            .order_by('featured_rank__rank')
+        )
+
+
+class FrequentlyBoughtTogetherView(CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
+    """
+    Products most often bought together with the given product, from the
+    ranking built by `manage.py build_recommendations`.
+    """
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    
+    cache_entities = ('product', 'category', 'review', 'recommendations')
+
     def get_queryset(self):
-        # Assuming we'll add a 'featured' field to Product model later
-        # For now, return products ordered by creation date
-        return Product.objects.all().order_by('-created_at')[:10]
+        if getattr(self, 'swagger_fake_view', False):
+            return Product.objects.none()
+        product_id = self.kwargs['pk']
+        ids = bought_together_ids(product_id)
+        if not ids:
+            return Product.objects.none()
+        return (
+            Product.objects.filter(pk__in=ids, is_active=True, recommended_for__product_id=product_id)
+            .order_by('recommended_for__rank')
+        )
+
+    def get_validator_values(self, request, *args, **kwargs):
+        values = super().get_validator_values(request, *args, **kwargs)
+        # A re-ranking can reorder the same products without touching them
+        values['ranking'] = tuple(bought_together_ids(self.kwargs['pk']))
+        return values
 
 
-class LatestProductsView(generics.ListAPIView):
-    queryset = Product.objects.all().order_by('-created_at')[:20]
+class LatestProductsView(CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    latest_limit = 20
 
+    def get_queryset(self):
+        # Built per request; served by the (created_at, id) index
+        return Product.objects.order_by('-created_at', '-id')[:self.latest_limit]
 
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
+
+class TrendingProductsView(CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
+    """
+    Products by decayed view and add-to-cart activity.
+    Scores are folded in periodically by `manage.py flush_trending`.
+    """
+    serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_entities = ('product', 'category', 'review', 'trending')
+    trending_limit = 50
+
+    def get_queryset(self):
+        # Served by the (trending_score, id) index
+        return (
+            Product.objects.filter(is_active=True, trending_score__gt=0)
+            .order_by('-trending_score', '-id')[:self.trending_limit]
+        )
+
+    def get_validator_aggregates(self):
+        aggregates = super().get_validator_aggregates()
+        # Scores move on every flush without touching updated_at
+        aggregates['trending'] = Sum('trending_score')
+        return aggregates
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
-    queryset = Category.objects.all()
+class CategoryListView(CachedResponseMixin, CategoryValidatorsMixin, CompiledListMixin, generics.ListAPIView):
+    cache_entities = ('category', 'product')
+    queryset = Category.objects.with_product_stats()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class CategoryBySlugView(generics.RetrieveAPIView):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
+class CategoryTreeView(APIView):
+    """
+    Category menu payload with active product counts and price ranges.
+    Built in one query and cached until a category or product changes.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        return Response(cached_payload('category-tree', ('category', 'product'), build_category_tree))
+
+
+class CategoryDetailView(CategoryDetailValidatorsMixin, generics.RetrieveAPIView):
+    queryset = Category.objects.with_product_stats()
+    serializer_class = CategoryDetailSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class CategoryBySlugView(CategoryDetailValidatorsMixin, generics.RetrieveAPIView):
+    queryset = Category.objects.with_product_stats()
+    serializer_class = CategoryDetailSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
 
 
-class CategoryProductsView(generics.ListAPIView):
+class CategoryProductsView(CachedResponseMixin, ProductValidatorsMixin, SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
+    """
+    Products in a category. ?include_descendants=true also lists products
+    of every subcategory, selected with one prefix match on the category path.
+    """
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -133,4 +383,9 @@ class CategoryProductsView(generics.ListAPIView):
         if getattr(self, 'swagger_fake_view', False):
             return Product.objects.none()
         category_id = self.kwargs['pk']
+        if self.request.query_params.get('include_descendants', '').lower() in ('1', 'true', 'yes'):
+            category = Category.objects.filter(pk=category_id).only('path').first()
+            if category is None:
+                return Product.objects.none()
+            return Product.objects.filter(category__path__startswith=category.path)
         return Product.objects.filter(category_id=category_id)
@@ -0,0 +1,282 @@
+"""
+Compiled read-only serialization for hot list endpoints.
+
+``compile_serializer`` walks a ``ModelSerializer`` once and turns every
+selected field into a ``.values()`` lookup plus a precomputed converter, so
+list views build plain dicts straight from ``.values()`` rows instead of
+instantiating model instances and running DRF's per-field machinery on
+each of them. Plans are memoized per serializer class and
+``?fields=``/``?expand=`` selection.
+
+The output matches the serializer's own ``to_representation``. Fields that
+are not plain columns are described in ``Meta.compiled_fields``: field
+name -> (lookups, function), where lookups are ORM paths or query
+expressions (annotated on the root queryset) and the function receives
+their values in order; a ``None`` function passes a single value through.
+A third element set to ``True`` also passes the request as the last
+argument (for absolute URLs).
+A field the compiler cannot map raises ``NotCompilable`` and
+``CompiledListMixin`` falls back to the regular serializer.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .sparse_fields import SparseFieldsetMixin, build_expanded, get_fieldsets
+
+
+# Fields whose to_representation() is the identity for values() output
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def resolve_model_field(model, lookup):
+    """Model field at the end of a ``a__b__c`` lookup"""
+    field = None
+    for part in lookup.split('__'):
+        if model is None:
+            raise NotCompilable(lookup)
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            raise NotCompilable(lookup)
+        model = field.related_model
+    return field
+
+
+def build_converter(field, model_field):
+    """(value, request) -> representation for a non-null column value, or None for identity"""
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.FileField):
+        storage = model_field.storage
+        use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+        def convert_file(value, request):
+            if not value:
+                return None
+            if not use_url:
+                return value
+            url = storage.url(value)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert_file
+    to_representation = field.to_representation
+    return lambda value, request: to_representation(value)
+
+
+def column_getter(key, convert):
+    if convert is None:
+        return lambda row, request: row[key]
+
+    def get(row, request):
+        value = row[key]
+        return None if value is None else convert(value, request)
+    return get
+
+
+def computed_getter(keys, function, pass_request=False):
+    if function is None:
+        key, = keys
+        return lambda row, request: row[key]
+    if pass_request:
+        return lambda row, request: function(*[row[key] for key in keys], request)
+    return lambda row, request: function(*[row[key] for key in keys])
+
+
+def nested_getter(pk_key, nested):
+    def get(row, request):
+        if row[pk_key] is None:
+            return None
+        return nested.build(row, request)
+    return get
+
+
+class CompiledPlan:
+    def __init__(self, model, prefix=''):
+        self.model = model
+        self.prefix = prefix
+        self.pk_key = f'{prefix}{model._meta.pk.attname}'
+        self.columns = [self.pk_key]
+        self.annotations = {}
+        self.getters = []
+        self.children = []
+
+    def add_column(self, lookup):
+        key = f'{self.prefix}{lookup}'
+        if key not in self.columns:
+            self.columns.append(key)
+        return key
+
+    def build(self, row, request):
+        return {name: get(row, request) for name, get in self.getters}
+
+    def values(self, queryset, extra=()):
+        """``.values()`` queryset carrying every column the plan reads"""
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        columns = dict.fromkeys([*self.columns, *extra])
+        # Related rows are fetched by serialize(), never by the ORM
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows, request=None):
+        rows = list(rows)
+        results = [self.build(row, request) for row in rows]
+        for name, relation, child in self.children:
+            ids = [row[self.pk_key] for row in rows]
+            grouped = defaultdict(list)
+            if ids:
+                related_model = relation.related_model
+                fk = relation.field.attname
+                child_rows = child.values(
+                    related_model._default_manager.filter(**{f'{fk}__in': ids})
+                    .order_by(*(related_model._meta.ordering or ['pk'])),
+                    extra=[fk],
+                )
+                child_rows = list(child_rows)
+                for child_row, data in zip(child_rows, child.serialize(child_rows, request)):
+                    grouped[child_row[fk]].append(data)
+            for row, data in zip(rows, results):
+                data[name] = grouped.get(row[self.pk_key], [])
+        return results
+
+
+def freeze(tree):
+    if not tree:
+        return None
+    return tuple(sorted((name, freeze(child)) for name, child in tree.items()))
+
+
+def thaw(frozen):
+    if frozen is None:
+        return None
+    return {name: thaw(child) or {} for name, child in frozen}
+
+
+def build_compiled(serializer_class, model, fields_tree, expand_tree, prefix=''):
+    plan = CompiledPlan(model, prefix)
+    if not issubclass(serializer_class, SparseFieldsetMixin):
+        # The serializer itself ignores ?fields= and ?expand=
+        fields_tree, expand_tree = None, {}
+    meta = serializer_class.Meta
+    expandable = getattr(meta, 'expandable_fields', {})
+    computed = getattr(meta, 'compiled_fields', {})
+
+    for name, field in serializer_class().get_fields().items():
+        if field.write_only or (fields_tree and name not in fields_tree):
+            continue
+        child_fields = fields_tree.get(name) if fields_tree else None
+        child_expand = (expand_tree or {}).get(name) or {}
+        if name in expandable and expand_tree and name in expand_tree:
+            field = build_expanded(*expandable[name])
+        # Fields are unbound here, so an implicit source is still None
+        source = field.source or name
+
+        if name in computed:
+            lookups, function, *pass_request = computed[name]
+            keys = []
+            for position, lookup in enumerate(lookups):
+                if isinstance(lookup, str):
+                    keys.append(plan.add_column(lookup))
+                elif prefix:
+                    # Expressions can only be annotated on the root queryset
+                    raise NotCompilable(name)
+                else:
+                    alias = f'compiled_{name}_{position}'
+                    plan.annotations[alias] = lookup
+                    keys.append(plan.add_column(alias))
+            plan.getters.append((name, computed_getter(keys, function, *pass_request)))
+        elif isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            if prefix:
+                raise NotCompilable(name)
+            relation = resolve_model_field(model, source)
+            if not relation.one_to_many:
+                raise NotCompilable(name)
+            child = build_compiled(type(field.child), relation.related_model, child_fields or None, child_expand)
+            plan.children.append((name, relation, child))
+            plan.getters.append((name, lambda row, request: None))
+        elif isinstance(field, serializers.ModelSerializer):
+            relation = resolve_model_field(model, source)
+            if not relation.many_to_one:
+                raise NotCompilable(name)
+            nested = build_compiled(
+                type(field), relation.related_model, child_fields or None, child_expand,
+                prefix=f'{prefix}{source}__',
+            )
+            if nested.children:
+                raise NotCompilable(name)
+            for column in nested.columns:
+                if column not in plan.columns:
+                    plan.columns.append(column)
+            plan.getters.append((name, nested_getter(nested.pk_key, nested)))
+        elif isinstance(field, serializers.Serializer) or source == '*':
+            raise NotCompilable(name)
+        elif isinstance(field, (serializers.SerializerMethodField, serializers.ManyRelatedField)):
+            raise NotCompilable(name)
+        else:
+            lookup = source.replace('.', '__')
+            model_field = resolve_model_field(model, lookup)
+            if model_field.many_to_many or model_field.one_to_many:
+                raise NotCompilable(name)
+            key = plan.add_column(lookup)
+            plan.getters.append((name, column_getter(key, build_converter(field, model_field))))
+    return plan
+
+
+@lru_cache(maxsize=256)
+def _compile(serializer_class, model, fields, expand):
+    return build_compiled(serializer_class, model, thaw(fields), thaw(expand))
+
+
+def compile_serializer(serializer_class, context=None):
+    """Memoized ``CompiledPlan`` for ``serializer_class`` and the request's field selection"""
+    fields_tree, expand_tree = get_fieldsets(context if context is not None else {})
+    return _compile(serializer_class, serializer_class.Meta.model, freeze(fields_tree), freeze(expand_tree))
+
+
+def ordering_columns(queryset):
+    """Columns the queryset orders by; paginators read them back from the rows"""
+    columns = ['id']
+    for field in queryset.query.order_by or queryset.model._meta.ordering:
+        if isinstance(field, str) and field.lstrip('-') not in ('?', 'pk'):
+            columns.append(field.lstrip('-'))
+    return columns
+
+
+class CompiledListMixin:
+    """
+    List view mixin serializing pages through the compiled plan of
+    ``serializer_class``. Views keep their regular serializer for the schema
+    and fall back to it when the serializer cannot be compiled.
+    """
+
+    def get_compiled_plan(self):
+        try:
+            return compile_serializer(self.get_serializer_class(), self.get_serializer_context())
+        except NotCompilable:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        plan = None
+        if not getattr(self, 'swagger_fake_view', False):
+            plan = self.get_compiled_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = plan.values(queryset, extra=ordering_columns(queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page, request))
+        return Response(plan.serialize(rows, request))
@@ -0,0 +1,80 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304 Not Modified).
+
+Validators are derived from a single aggregate query over the rows a view
+would serialize (``MAX(updated_at)`` plus row counts), so a matching
+``If-None-Match`` or ``If-Modified-Since`` short-circuits with a 304 before
+the serializer runs.
+"""
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.mixins import RetrieveModelMixin
+
+
+def build_validators(values):
+    """Turn aggregate values into an (etag, last_modified timestamp) pair"""
+    if not values:
+        return None, None
+    digest = hashlib.sha1(repr(sorted(values.items())).encode('utf-8')).hexdigest()
+    timestamps = [value for value in values.values() if isinstance(value, datetime)]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return quote_etag(digest), last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 when the client's validators still match.
+
+    Generic views aggregate ``validator_aggregates`` over the same queryset
+    they would serialize (narrowed to the looked-up object for detail
+    views). Other views override ``get_validator_values``.
+    """
+    validator_field = 'updated_at'
+    validator_related_fields = ()
+
+    def get_validator_aggregates(self):
+        aggregates = {
+            'last_modified': Max(self.validator_field),
+            'count': Count('pk', distinct=True),
+        }
+        for field in self.validator_related_fields:
+            aggregates[f'{field}_max'] = Max(field)
+        return aggregates
+
+    def get_validator_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_validator_values(self, request, *args, **kwargs):
+        queryset = self.get_validator_queryset()
+        is_detail = isinstance(self, RetrieveModelMixin)
+        if is_detail:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        values = queryset.aggregate(**self.get_validator_aggregates())
+        if is_detail and not values['count']:
+            # Let the view raise its usual 404
+            return None
+        return values
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = build_validators(self.get_validator_values(request, *args, **kwargs))
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
@@ -0,0 +1,188 @@
+"""
+Pagination for list endpoints.
+
+Page-number pagination stays the default. Clients that page deep into large
+lists can opt into keyset (cursor) pagination per request with
+``?pagination=cursor``; the ``next``/``previous`` links returned in that mode
+carry an opaque ``?cursor=`` token. Keyset pages filter on the current
+ordering columns plus ``id`` as a tie-breaker instead of issuing ``COUNT(*)``
+and ``OFFSET``, so page cost stays constant however deep the client goes.
+"""
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over the queryset's own ordering.
+
+    The ordering already applied to the queryset (by OrderingFilter, the view
+    or the model Meta) is extended with ``id`` as a tie-breaker, and pages are
+    selected with ``WHERE (col, id) > (last_col, last_id)`` style filters.
+    """
+    page_size = PageNumberPagination.page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+
+        values, reverse = self.decode_cursor(request, queryset.model)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, reverse))
+
+        ordering = self.invert(self.ordering) if reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for field in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(field, str) or '__' in field or field.lstrip('-') in ('?', 'pk', 'id'):
+                continue
+            ordering.append(field)
+        descending = bool(ordering) and ordering[0].startswith('-')
+        ordering.append('-id' if descending else 'id')
+        return ordering
+
+    @staticmethod
+    def invert(ordering):
+        return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+    def keyset_filter(self, values, reverse):
+        """Rows strictly after ``values`` in the (possibly reversed) ordering"""
+        ordering = self.invert(self.ordering) if reverse else self.ordering
+        clauses = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {ordering[i].lstrip('-'): values[i] for i in range(position)}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[position]}))
+        return reduce(or_, clauses)
+
+    def position(self, obj):
+        # Compiled list views page over .values() rows
+        if isinstance(obj, dict):
+            return [_encode_value(obj[field.lstrip('-')]) for field in self.ordering]
+        return [_encode_value(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values, reverse = cursor['v'], bool(cursor.get('r'))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            # Converted here so a tampered value is a 404, not a 500 from the filter
+            values = [self.to_python(model, field, value) for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def to_python(model, field, value):
+        try:
+            model_field = model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            # Annotations have no field to convert with
+            return value
+        return model_field.to_python(value)
+
+    def encode_cursor(self, obj, reverse):
+        cursor = {'v': self.position(obj)}
+        if reverse:
+            cursor['r'] = 1
+        encoded = b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination by default; keyset pagination when the request
+    asks for it with ``?pagination=cursor`` or carries a ``?cursor=`` token.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = None
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Sliced querysets (e.g. "latest 20") cannot be filtered further
+        is_sliced = getattr(getattr(queryset, 'query', None), 'is_sliced', True)
+        if self.wants_keyset(request) and not is_sliced:
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.get_page_size(request) or self.page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        return response_schema
@@ -0,0 +1,16 @@
+"""
+Access to the raw Redis client behind the default cache.
+
+Features that need Redis data structures (hashes, sets, scripts) rather
+than plain cache keys go through ``redis_connection``, which returns None
+when the default cache is not django-redis (local development, tests).
+"""
+
+
+def redis_connection():
+    """Raw Redis client behind the default cache, or None for other backends"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
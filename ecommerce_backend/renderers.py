@@ -0,0 +1,43 @@
+"""
+JSON rendering backed by orjson.
+
+orjson is an optional speed-up: without it, or when the client asks for
+indented output (``Accept: application/json; indent=4``, the browsable
+API), or when ``UNICODE_JSON``/``COMPACT_JSON`` are turned off, rendering
+falls back to DRF's stdlib ``JSONRenderer``. Values orjson does not handle
+natively (Decimal, lazy strings, datetimes) go through DRF's own encoder
+so both paths produce the same document.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    def __init__(self):
+        self._default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self._default,
+            # DRF's encoder formats datetimes (millisecond precision, 'Z' suffix)
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Keep the output a strict javascript subset, as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
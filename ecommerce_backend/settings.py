@@ -148,6 +148,39 @@ else:
         }
     }
 
+# Cart storage (cart.backends): 'cart.backends.DatabaseCartBackend', or
+# 'cart.backends.RedisCartBackend' with REDIS_URL set and `manage.py flush_carts`
+# persisting snapshots. Redis carts expire after CART_REDIS_TTL seconds idle.
+CART_BACKEND = config('CART_BACKEND', default='cart.backends.DatabaseCartBackend')
+CART_REDIS_TTL = config('CART_REDIS_TTL', default=60 * 60 * 24 * 30, cast=int)
+# Anonymous carts travel in a signed token (cart.guest) in this cookie or the
+# X-Guest-Cart header, and are merged into the user's cart on login/registration
+CART_GUEST_COOKIE = 'guest_cart'
+CART_GUEST_MAX_AGE = config('CART_GUEST_MAX_AGE', default=60 * 60 * 24 * 30, cast=int)
+CART_GUEST_MAX_LINES = 50
+
+# Carts with no line changed for this many days are removed by `manage.py reap_carts`
+CART_MAX_IDLE_DAYS = config('CART_MAX_IDLE_DAYS', default=30, cast=int)
+
+# Cached /cart/summary/ badge numbers; dropped on every cart change and product update
+CART_SUMMARY_TIMEOUT = config('CART_SUMMARY_TIMEOUT', default=60 * 60, cast=int)
+
+# Lifetime of cached public catalog responses (invalidated early by catalog.cache generations)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+
+# Upper bounds of the price histogram returned with ?facets=true (last bucket is open-ended)
+CATALOG_PRICE_BUCKETS = [25, 50, 100, 250, 500]
+
+# Product image derivatives (catalog.images): widths built for every upload, and
+# whether uploads are processed on a background thread ('thread') or left to
+# `manage.py process_product_images` ('command')
+CATALOG_IMAGE_WIDTHS = [160, 320, 640, 1024]
+CATALOG_IMAGE_PIPELINE = config('CATALOG_IMAGE_PIPELINE', default='thread')
+
+# Trending score (catalog.trending): half-life of the decay and points per counted event
+CATALOG_TRENDING_HALF_LIFE_HOURS = config('CATALOG_TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+CATALOG_TRENDING_WEIGHTS = {'view': 1, 'cart': 5}
+
 
 
 
@@ -220,14 +253,14 @@ REST_FRAMEWORK = {
         'anon': '100/hour',
         'user': '1000/hour'
     },
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'ecommerce_backend.pagination.HybridPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'ecommerce_backend.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -263,7 +296,7 @@ DEFAULT_FROM_EMAIL = 'noreply@ecommerce.com'
 FRONTEND_URL = 'http://localhost:3000'
 
 # Pagination settings
-REST_FRAMEWORK['DEFAULT_PAGINATION_CLASS'] = 'rest_framework.pagination.PageNumberPagination'
+REST_FRAMEWORK['DEFAULT_PAGINATION_CLASS'] = 'ecommerce_backend.pagination.HybridPagination'
 REST_FRAMEWORK['PAGE_SIZE'] = 20
 
 # Rate Limiting
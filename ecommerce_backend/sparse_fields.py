@@ -0,0 +1,219 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?expand=`` for read endpoints.
+
+``?fields=id,title,items.product.price`` keeps only the listed serializer
+fields; dotted paths select inside nested serializers, and naming a nested
+field without a path keeps all of its fields. ``?expand=product`` swaps a
+serializer's ``Meta.expandable_fields`` entries (primary keys by default)
+for nested representations.
+
+The same selection is pushed down to SQL by ``plan_queryset``: only the
+columns behind the selected fields are loaded (``.only()``), forward
+relations they traverse are joined (``select_related``) and nested lists
+are prefetched with their own column lists, so unused columns and
+relations are never fetched.
+
+Serializers describe fields that are not plain model columns in
+``Meta.sparse_sources`` (field name -> list of ORM lookups it reads) and
+``Meta.sparse_prefetch`` (field name -> reverse relations it iterates).
+A selected field the planner cannot map disables ``.only()`` for that
+queryset instead of causing per-row deferred loads.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_tree(value):
+    """'id,items.product.title' -> {'id': {}, 'items': {'product': {'title': {}}}}"""
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def get_fieldsets(context):
+    """Parsed (fields, expand) trees for the request in ``context``, memoized there"""
+    if '_fieldsets' not in context:
+        fields, expand = None, {}
+        request = context.get('request')
+        if request is not None:
+            params = getattr(request, 'query_params', request.GET)
+            if params.get(FIELDS_PARAM):
+                fields = parse_tree(params[FIELDS_PARAM]) or None
+            if params.get(EXPAND_PARAM):
+                expand = parse_tree(params[EXPAND_PARAM])
+        context['_fieldsets'] = (fields, expand)
+    return context['_fieldsets']
+
+
+def subtree(tree, path):
+    """Selection below ``path``; None means every field"""
+    for name in path:
+        if not tree:
+            return None
+        tree = tree.get(name)
+    return tree or None
+
+
+def field_requested(context, name):
+    fields, _ = get_fieldsets(context)
+    return fields is None or name in fields
+
+
+def field_path(serializer):
+    path, node = [], serializer
+    while node.parent is not None:
+        if node.field_name:
+            path.append(node.field_name)
+        node = node.parent
+    return path[::-1]
+
+
+def build_expanded(serializer_class, options):
+    return serializer_class(read_only=True, **options)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin applying the request's ``?fields=``/``?expand=`` selection
+    at whatever depth the serializer is nested.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields_tree, expand_tree = get_fieldsets(self.context)
+        path = field_path(self)
+
+        expand = subtree(expand_tree, path) or {}
+        for name, (serializer_class, options) in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                fields[name] = build_expanded(serializer_class, options)
+
+        selected = subtree(fields_tree, path)
+        if selected:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in selected or field.write_only
+            }
+        return fields
+
+
+class QueryPlan:
+    def __init__(self):
+        self.columns = set()
+        self.prefetches = []
+        self.restrictable = True
+
+    def add_nested(self, relation, nested):
+        self.columns.update(f'{relation}__{column}' for column in nested.columns)
+        self.prefetches.extend(
+            Prefetch(f'{relation}__{prefetch.prefetch_through}', queryset=prefetch.queryset)
+            for prefetch in nested.prefetches
+        )
+        self.restrictable = self.restrictable and nested.restrictable
+
+    @property
+    def select_related(self):
+        related = set()
+        for column in self.columns:
+            parts = column.split('__')[:-1]
+            related.update('__'.join(parts[:i]) for i in range(1, len(parts) + 1))
+        return sorted(related)
+
+    @property
+    def only(self):
+        # Traversed foreign keys must be loaded too, or select_related refuses them
+        return sorted(self.columns.union(self.select_related))
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetches:
+            queryset = queryset.prefetch_related(*self.prefetches)
+        return queryset
+
+
+def build_plan(serializer_class, model, fields_tree, expand_tree):
+    plan = QueryPlan()
+    plan.columns.add(model._meta.pk.name)
+    meta = serializer_class.Meta
+    expandable = getattr(meta, 'expandable_fields', {})
+    sources = getattr(meta, 'sparse_sources', {})
+    prefetch_sources = getattr(meta, 'sparse_prefetch', {})
+    extra_prefetches = []
+
+    for name, field in serializer_class().get_fields().items():
+        if field.write_only or (fields_tree and name not in fields_tree):
+            continue
+        child_fields = fields_tree.get(name) if fields_tree else None
+        child_expand = (expand_tree or {}).get(name) or {}
+        if name in expandable and expand_tree and name in expand_tree:
+            field = build_expanded(*expandable[name])
+        # Fields are unbound here, so an implicit source is still None
+        source = field.source or name
+
+        if name in prefetch_sources:
+            extra_prefetches.extend(prefetch_sources[name])
+        if name in sources:
+            plan.columns.update(sources[name])
+        elif isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            relation = model._meta.get_field(source)
+            nested = build_plan(type(field.child), relation.related_model, child_fields or None, child_expand)
+            queryset = nested.apply(relation.related_model.objects.all())
+            if nested.restrictable:
+                queryset = queryset.only(*nested.only, relation.field.attname)
+            plan.prefetches.append(Prefetch(source, queryset=queryset))
+        elif isinstance(field, serializers.ModelSerializer):
+            relation = model._meta.get_field(source)
+            plan.columns.add(source)
+            plan.add_nested(source, build_plan(
+                type(field), relation.related_model, child_fields or None, child_expand
+            ))
+        elif source == '*':
+            plan.restrictable = False
+        else:
+            lookup = source.replace('.', '__')
+            try:
+                model._meta.get_field(lookup.split('__')[0])
+            except FieldDoesNotExist:
+                plan.restrictable = False
+            else:
+                plan.columns.add(lookup)
+
+    # Relations iterated by computed fields, unless a nested field already prefetches them
+    planned = {prefetch.prefetch_to.split('__')[0] for prefetch in plan.prefetches}
+    plan.prefetches.extend(
+        Prefetch(lookup) for lookup in extra_prefetches
+        if lookup.split('__')[0] not in planned
+    )
+    return plan
+
+
+def plan_queryset(queryset, serializer_class, context):
+    """Load only what ``serializer_class`` will render for this request"""
+    fields_tree, expand_tree = get_fieldsets(context)
+    plan = build_plan(serializer_class, queryset.model, fields_tree, expand_tree)
+    queryset = plan.apply(queryset)
+    if plan.restrictable:
+        queryset = queryset.only(*plan.only)
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """Generic view mixin pushing the serializer's field selection into the queryset"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        return plan_queryset(queryset, self.get_serializer_class(), self.get_serializer_context())
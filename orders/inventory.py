@@ -0,0 +1,137 @@
+"""
+Inventory reservation for orders.
+
+Placing an order reserves its stock with a conditional decrement:
+
+    UPDATE product SET stock_quantity = stock_quantity - q
+    WHERE id = ... AND stock_quantity >= q
+
+The check and the write are one statement, so concurrent checkouts of a hot
+product never act on a stale count and cannot oversell it. The order's
+product rows are first locked in product-id order, so two multi-line orders
+always take their locks in the same sequence and cannot deadlock; all lines
+are then decremented by a single UPDATE. If it touches fewer rows than the
+order has products, ``InsufficientStock`` is raised and the caller's
+transaction rolls the whole order back.
+
+Stock is returned when an order is cancelled or its payment fails, if the
+order holds it (``Order.stock_reserved``; orders placed before reservation
+existed never took any). ``release_order`` clears the flag with a
+conditional UPDATE first, so a repeated or concurrent cancellation
+releases the stock only once, and
+``complete_payment`` refuses orders whose stock was already released.
+
+Cached catalog responses are not invalidated for every stock change, which
+would empty the product cache on each order: ``stock_quantity`` may be
+stale for the cache timeout. The product generation is bumped only when a
+product runs out or comes back in stock, which the in-stock facet,
+featured products and availability depend on.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from catalog.cache import invalidate
+from catalog.models import Product
+
+from .models import Order
+
+
+# Orders in these statuses no longer hold stock
+RELEASED_STATUSES = ('cancelled', 'failed')
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for products {', '.join(map(str, self.product_ids))}.")
+
+
+def order_quantities(lines):
+    """``{product_id: quantity}`` summed over ``(product_id, quantity)`` lines, in product-id order"""
+    totals = Counter()
+    for product_id, quantity in lines:
+        totals[product_id] += quantity
+    return dict(sorted(totals.items()))
+
+
+def per_product(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField()
+    )
+
+
+def lock_products(product_ids):
+    """Lock the product rows in id order; returns ``{product_id: stock_quantity}``"""
+    return dict(
+        Product.objects.select_for_update().filter(pk__in=product_ids)
+        .order_by('pk').values_list('pk', 'stock_quantity')
+    )
+
+
+def reserve_stock(quantities):
+    """Take ``{product_id: quantity}`` out of stock; runs inside the order's transaction"""
+    if not quantities:
+        return
+    stock = lock_products(quantities)
+    short = [product_id for product_id, quantity in quantities.items() if stock.get(product_id, 0) < quantity]
+    if short:
+        raise InsufficientStock(short)
+
+    amount = per_product(quantities)
+    # update() skips auto_now: bump updated_at so product validators and the feed see the stock change
+    updated = Product.objects.filter(pk__in=list(quantities), stock_quantity__gte=amount).update(
+        stock_quantity=F('stock_quantity') - amount, updated_at=timezone.now()
+    )
+    if updated < len(quantities):
+        # Only reachable where the lock is a no-op (SQLite); the condition still holds
+        raise InsufficientStock(quantities)
+    if any(stock[product_id] == quantity for product_id, quantity in quantities.items()):
+        # Sold out
+        invalidate('product')
+
+
+def release_stock(quantities):
+    if not quantities:
+        return
+    stock = lock_products(quantities)
+    Product.objects.filter(pk__in=list(quantities)).update(
+        stock_quantity=F('stock_quantity') + per_product(quantities), updated_at=timezone.now()
+    )
+    if 0 in stock.values():
+        # Back in stock
+        invalidate('product')
+
+
+def release_order(order, status):
+    """
+    Move ``order`` to ``status`` (one of ``RELEASED_STATUSES``) and return its
+    stock if it holds any. Returns False, changing nothing, if the order was
+    already released.
+    """
+    now = timezone.now()
+    open_orders = Order.objects.filter(pk=order.pk).exclude(status__in=RELEASED_STATUSES)
+    with transaction.atomic():
+        if open_orders.filter(stock_reserved=True).update(status=status, stock_reserved=False, updated_at=now):
+            release_stock(order_quantities(order.items.values_list('product_id', 'quantity')))
+        elif not open_orders.update(status=status, updated_at=now):
+            return False
+    order.status, order.stock_reserved, order.updated_at = status, False, now
+    return True
+
+
+def complete_payment(order):
+    """
+    Mark ``order`` paid and completed. Returns False, changing nothing, if
+    its stock was already released (cancelled or failed).
+    """
+    now = timezone.now()
+    moved = Order.objects.filter(pk=order.pk).exclude(status__in=RELEASED_STATUSES).update(
+        payment_status='paid', status='completed', updated_at=now
+    )
+    if moved:
+        order.payment_status, order.status, order.updated_at = 'paid', 'completed', now
+    return bool(moved)
@@ -0,0 +1,94 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Category, Product
+from orders.models import Order, OrderItem
+from orders.serializers import CreateOrderSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare placing 1-, 10- and 100-line orders with per-line queries '
+        'against the set-based CreateOrderSerializer. Sample rows are created '
+        'in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100], help='Order sizes (default: 1 10 100)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case, best is kept (default: 5)')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+
+        with transaction.atomic():
+            self.user, products = self.create_sample_data(max(options['lines']))
+            self.stdout.write(
+                f"{'lines':>6}{'per-line ms':>14}{'queries':>10}{'set-based ms':>15}{'queries':>10}{'speedup':>10}"
+            )
+            for lines in options['lines']:
+                items = [{'product_id': product.pk, 'quantity': 2} for product in products[:lines]]
+                per_line, per_line_queries = self.measure(lambda: self.place_per_line(items))
+                set_based, set_based_queries = self.measure(lambda: self.place_set_based(items))
+                speedup = per_line / set_based if set_based else float('inf')
+                self.stdout.write(
+                    f"{lines:>6}{per_line * 1000:>14.2f}{per_line_queries:>10}"
+                    f"{set_based * 1000:>15.2f}{set_based_queries:>10}{speedup:>9.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, function):
+        """Best time over ``repeat`` runs, and the queries of one run"""
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                function()
+                timings.append(time.perf_counter() - start)
+        return min(timings), len(queries.captured_queries)
+
+    def place_per_line(self, items):
+        """The previous placement path: one get per line to validate and price, one insert per line"""
+        for item in items:
+            Product.objects.get(id=item['product_id'])
+        with transaction.atomic():
+            order_items = []
+            total_amount = 0
+            for item in items:
+                product = Product.objects.get(id=item['product_id'])
+                subtotal = product.price * item['quantity']
+                total_amount += subtotal
+                order_items.append((product, item['quantity'], product.price, subtotal))
+            order = Order.objects.create(user=self.user, total_amount=total_amount)
+            for product, quantity, unit_price, subtotal in order_items:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=quantity, unit_price=unit_price, subtotal=subtotal
+                )
+
+    def place_set_based(self, items):
+        serializer = CreateOrderSerializer(data={'items': [dict(item) for item in items]})
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(user=self.user)
+
+    def create_sample_data(self, count):
+        user = User.objects.create_user(
+            email='order-benchmark@example.com', username='order-benchmark', password='benchmark'
+        )
+        category = Category.objects.create(name='Order benchmark', slug='order-benchmark')
+        products = Product.objects.bulk_create(
+            Product(
+                title=f'Order benchmark product {i}',
+                slug=f'order-benchmark-product-{i}',
+                description='Benchmark product description',
+                price=Decimal('4.99') + i,
+                stock_quantity=1000,
+                category=category,
+            )
+            for i in range(count)
+        )
+        return user, products
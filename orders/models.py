@@ -23,9 +23,16 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='unpaid')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Set while the order holds its stock (see orders.inventory)
+    stock_reserved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"Order #{self.pk} - {self.user}"
 
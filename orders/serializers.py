@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
+from .inventory import order_quantities, reserve_stock
 from catalog.serializers import ProductSerializer
 from users.serializers import AddressSerializer
+from ecommerce_backend.sparse_fields import SparseFieldsetMixin
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
 
@@ -14,7 +16,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'unit_price', 'subtotal']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
 
@@ -28,6 +30,12 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class CreateOrderSerializer(serializers.Serializer):
+    """
+    Validates and prices an order with one product query: ``validate_items``
+    loads every product with ``in_bulk`` and ``create`` reuses them, reserving
+    the stock and writing the order and all its lines with one ``bulk_create``.
+    ``create`` raises ``InsufficientStock`` and must run in a transaction.
+    """
     items = serializers.ListField(
         child=serializers.DictField(),
         allow_empty=False
@@ -42,17 +50,49 @@ class CreateOrderSerializer(serializers.Serializer):
         for item in value:
             if 'product_id' not in item or 'quantity' not in item:
                 raise serializers.ValidationError("Each item must have product_id and quantity.")
-            
             try:
-                product = Product.objects.get(id=item['product_id'])
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(f"Product with id {item['product_id']} does not exist.")
-            
+                item['product_id'] = int(item['product_id'])
+                item['quantity'] = int(item['quantity'])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError("product_id and quantity must be integers.")
             if item['quantity'] <= 0:
                 raise serializers.ValidationError("Quantity must be greater than 0.")
+
+        self.products = Product.objects.select_related('category').in_bulk({item['product_id'] for item in value})
+        for item in value:
+            if item['product_id'] not in self.products:
+                raise serializers.ValidationError(f"Product with id {item['product_id']} does not exist.")
         
         return value
 
+    def build_items(self, order):
+        return [
+            OrderItem(
+                order=order,
+                product=self.products[item['product_id']],
+                quantity=item['quantity'],
+                unit_price=self.products[item['product_id']].price,
+                subtotal=self.products[item['product_id']].price * item['quantity'],
+            )
+            for item in self.validated_data['items']
+        ]
+
+    def create(self, validated_data):
+        reserve_stock(order_quantities(
+            (item['product_id'], item['quantity']) for item in validated_data['items']
+        ))
+        order = Order(user=validated_data['user'], stock_reserved=True)
+        items = self.build_items(order)
+        order.total_amount = sum(item.subtotal for item in items)
+        order.save()
+        OrderItem.objects.bulk_create(items)
+        # Serve order.items from memory for the response
+        queryset = order.items.none()
+        queryset._result_cache = items
+        queryset._prefetch_done = True
+        order._prefetched_objects_cache = {'items': queryset}
+        return order
+
 
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -70,14 +70,14 @@ class OrderCancellationTestCase(APITestCase):
             user=self.user,
             status='pending',
             total_amount=Decimal('199.98'),
-            
+            stock_reserved=True,
         )
         
         self.paid_order = Order.objects.create(
             user=self.user,
             status='paid',
             total_amount=Decimal('99.99'),
-            
+            stock_reserved=True,
         )
         
         self.shipped_order = Order.objects.create(
@@ -1,7 +1,16 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
 from users.models import User
 from catalog.models import Category, Product
 from orders.models import Order, OrderItem
+from cart.backends import get_cart_backend
+from catalog.cache import get_generations
+from orders.serializers import OrderSerializer
 
 
 class OrderModelTest(TestCase):
@@ -60,3 +69,228 @@ class OrderItemModelTest(TestCase):
 
         self.assertEqual(item.subtotal, subtotal)
         self.assertEqual(str(item), f"{quantity} x {self.product.title} in Order #{self.order.pk}")
+
+
+class OrderStatusConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="poller@example.com", username="poller", password="password123")
+        self.order = Order.objects.create(user=self.user, total_amount=10)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('order_status', kwargs={'pk': self.order.pk})
+
+    def test_unchanged_order_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_status_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Order.objects.filter(pk=self.order.pk).update(
+            status='processing',
+            updated_at=self.order.updated_at + timedelta(seconds=1)
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'processing')
+
+
+class CompiledOrderListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="lister@example.com", username="lister", password="password123")
+        category = Category.objects.create(name="Stationery")
+        pen = Product.objects.create(title="Pen", description="Blue pen", price=2.50, stock_quantity=100, category=category)
+        pad = Product.objects.create(title="Notepad", description="A5 notepad", price=4.00, stock_quantity=50, category=category)
+        for _ in range(2):
+            order = Order.objects.create(user=self.user, total_amount=9)
+            OrderItem.objects.create(order=order, product=pen, quantity=2, unit_price=2.50, subtotal=5.00)
+            OrderItem.objects.create(order=order, product=pad, quantity=1, unit_price=4.00, subtotal=4.00)
+        self.client.force_authenticate(self.user)
+
+    def test_order_list_matches_serializer_output(self):
+        response = self.client.get(reverse('order_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        request = response.wsgi_request
+        orders = Order.objects.filter(user=self.user).order_by('-created_at')
+        expected = OrderSerializer(orders, many=True, context={'request': request}).data
+        self.assertEqual(response.json()['results'], [dict(order) for order in expected])
+
+
+class CreateOrderQueryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com", username="buyer", password="password123")
+        category = Category.objects.create(name="Hardware")
+        self.products = [
+            Product.objects.create(title=f"Bolt {i}", description="M6 bolt", price=1.25, stock_quantity=100, category=category)
+            for i in range(10)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, products):
+        items = [{'product_id': product.pk, 'quantity': 2} for product in products]
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('create_order'), {'items': items}, format='json')
+
+    def test_query_count_does_not_grow_with_lines(self):
+        with self.assertNumQueries(8) as one_line:
+            self.create_order(self.products[:1])
+        with self.assertNumQueries(len(one_line.captured_queries)):
+            response = self.create_order(self.products)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['items']), 10)
+        self.assertEqual(float(response.data['total_amount']), 25.0)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.data['id']).count(), 10)
+
+    def test_missing_product_is_rejected(self):
+        response = self.client.post(
+            reverse('create_order'), {'items': [{'product_id': 999, 'quantity': 1}]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+class InventoryReservationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="stock@example.com", username="stock", password="password123")
+        category = Category.objects.create(name="Flash sale")
+        self.lamp = Product.objects.create(title="Lamp", description="Desk lamp", price=20, stock_quantity=3, category=category)
+        self.bulb = Product.objects.create(title="Bulb", description="LED bulb", price=2, stock_quantity=10, category=category)
+        self.client.force_authenticate(self.user)
+
+    def place(self, *lines):
+        items = [{'product_id': product.pk, 'quantity': quantity} for product, quantity in lines]
+        return self.client.post(reverse('create_order'), {'items': items}, format='json')
+
+    def test_order_reserves_stock(self):
+        modified = self.lamp.updated_at
+        response = self.place((self.lamp, 2), (self.bulb, 4))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.lamp.refresh_from_db()
+        self.assertGreater(self.lamp.updated_at, modified)
+        self.bulb.refresh_from_db()
+        self.assertEqual((self.lamp.stock_quantity, self.bulb.stock_quantity), (1, 6))
+
+    def test_only_stock_outs_invalidate_cached_products(self):
+        def generation_after(action):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = action()
+            return response, get_generations(('product',))[0]
+
+        start = get_generations(('product',))[0]
+        response, generation = generation_after(lambda: self.place((self.lamp, 1), (self.bulb, 2)))
+        self.assertEqual(generation, start)
+        # The last lamps sell out, then come back in stock
+        response, generation = generation_after(lambda: self.place((self.lamp, 2)))
+        self.assertGreater(generation, start)
+        sold_out = generation
+        _, generation = generation_after(
+            lambda: self.client.post(reverse('cancel_order', kwargs={'pk': response.data['id']}))
+        )
+        self.assertGreater(generation, sold_out)
+
+    def test_shortfall_rolls_back_whole_order(self):
+        response = self.place((self.bulb, 4), (self.lamp, 4))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['product_ids'], [self.lamp.pk])
+        self.bulb.refresh_from_db()
+        self.assertEqual(self.bulb.stock_quantity, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_failed_checkout_keeps_cart(self):
+        cart = get_cart_backend(self.user)
+        cart.add(self.lamp, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_order'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(cart.quantities(), {self.lamp.pk: 4})
+
+    def test_cancel_releases_stock_once(self):
+        order_id = self.place((self.lamp, 3)).data['id']
+        url = reverse('cancel_order', kwargs={'pk': order_id})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock_quantity, 3)
+
+    def test_cancel_without_reservation_keeps_stock(self):
+        # Placed before reservation existed: nothing was taken, nothing is returned
+        order = Order.objects.create(user=self.user, total_amount=40)
+        OrderItem.objects.create(order=order, product=self.lamp, quantity=2, unit_price=20, subtotal=40)
+        response = self.client.post(reverse('cancel_order', kwargs={'pk': order.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['order']['status'], 'cancelled')
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock_quantity, 3)
+
+    def test_released_order_cannot_be_paid(self):
+        order_id = self.place((self.lamp, 3)).data['id']
+        self.client.post(reverse('cancel_order', kwargs={'pk': order_id}))
+        response = self.client.post(
+            reverse('process_payment', kwargs={'pk': order_id}), {'payment_method': 'card'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(reverse('confirm_payment', kwargs={'pk': order_id}))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'cancelled')
+
+    def test_failed_payment_releases_stock(self):
+        order_id = self.place((self.bulb, 5)).data['id']
+        admin = User.objects.create_superuser(email="admin@example.com", username="admin", password="password123")
+        self.client.force_authenticate(admin)
+        url = reverse('update_order_status', kwargs={'pk': order_id})
+        response = self.client.patch(url, {'status': 'failed'}, format='json')
+        self.assertEqual(response.data['status'], 'failed')
+        self.bulb.refresh_from_db()
+        self.assertEqual(self.bulb.stock_quantity, 10)
+        response = self.client.patch(url, {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """
+    Many buyers racing for the last units never oversell. Needs row locks
+    (PostgreSQL); SQLite's shared in-memory test database rejects
+    concurrent writers outright.
+    """
+    buyers = 12
+
+    def setUp(self):
+        category = Category.objects.create(name="Drop")
+        self.sneaker = Product.objects.create(title="Sneaker", description="Limited", price=90, stock_quantity=5, category=category)
+        self.sock = Product.objects.create(title="Sock", description="Limited", price=5, stock_quantity=7, category=category)
+        self.users = [
+            User.objects.create_user(email=f"buyer{i}@example.com", username=f"buyer{i}", password="password123")
+            for i in range(self.buyers)
+        ]
+
+    def checkout(self, user, barrier, results):
+        client = APIClient()
+        client.force_authenticate(user)
+        # Lines in opposite orders so unordered locking would deadlock
+        lines = [(self.sneaker, 1), (self.sock, 1)]
+        if user.pk % 2:
+            lines.reverse()
+        items = [{'product_id': product.pk, 'quantity': quantity} for product, quantity in lines]
+        barrier.wait()
+        try:
+            results.append(client.post(reverse('create_order'), {'items': items}, format='json').status_code)
+        except Exception as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    def test_no_oversell(self):
+        barrier, results = threading.Barrier(self.buyers), []
+        threads = [threading.Thread(target=self.checkout, args=(user, barrier, results)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.sneaker.refresh_from_db()
+        self.sock.refresh_from_db()
+        sold = OrderItem.objects.filter(product=self.sneaker).count()
+        self.assertEqual(len(results), self.buyers)
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 5)
+        self.assertEqual(results.count(status.HTTP_409_CONFLICT), self.buyers - 5)
+        self.assertEqual((sold, self.sneaker.stock_quantity, self.sock.stock_quantity), (5, 0, 2))
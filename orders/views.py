@@ -6,18 +6,22 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db import transaction
 from django.core.exceptions import PermissionDenied
-from .models import Order, OrderItem
+from django.utils.cache import get_conditional_response
+from .models import Order
+from .inventory import RELEASED_STATUSES, InsufficientStock, complete_payment, release_order
 from .serializers import (
     OrderSerializer, 
     CreateOrderSerializer, 
     OrderStatusUpdateSerializer,
     PaymentSerializer
 )
-from catalog.models import Product
-from cart.models import Cart
+from cart.backends import get_cart_backend
+from ecommerce_backend.compiled import CompiledListMixin
+from ecommerce_backend.sparse_fields import SparseFieldsetViewMixin
+from ecommerce_backend.conditional import ConditionalGetMixin, build_validators, set_validators
 
 
-class OrderListView(generics.ListAPIView):
+class OrderListView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -30,52 +34,30 @@ class OrderListView(generics.ListAPIView):
 class CreateOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
-        serializer = CreateOrderSerializer(data=request.data)
+        cart = get_cart_backend(request.user)
+        data = request.data
+        if 'items' not in data:
+            # Check out the stored cart
+            data = {'items': [
+                {'product_id': product_id, 'quantity': quantity}
+                for product_id, quantity in cart.quantities().items()
+            ]}
+        # Validation and pricing read outside the transaction; it only covers the writes
+        serializer = CreateOrderSerializer(data=data)
         if serializer.is_valid():
-            items_data = serializer.validated_data['items']
-            
-            # Calculate total amount
-            total_amount = 0
-            order_items = []
-            
-            for item_data in items_data:
-                product = Product.objects.get(id=item_data['product_id'])
-                quantity = item_data['quantity']
-                unit_price = product.price
-                subtotal = unit_price * quantity
-                total_amount += subtotal
-                
-                order_items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'unit_price': unit_price,
-                    'subtotal': subtotal
-                })
-            
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                total_amount=total_amount
-            )
-            
-            # Create order items
-            for item in order_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price'],
-                    subtotal=item['subtotal']
-                )
-            
-            # Clear user's cart if it exists
             try:
-                cart = Cart.objects.get(user=request.user)
-                cart.items.all().delete()
-            except Cart.DoesNotExist:
-                pass
+                with transaction.atomic():
+                    order = serializer.save(user=request.user)
+                    
+                    # Clear user's cart once the order is committed; a Redis cart
+                    # would not come back with a rollback
+                    transaction.on_commit(cart.clear)
+            except InsufficientStock as exc:
+                return Response(
+                    {'error': str(exc), 'product_ids': exc.product_ids},
+                    status=status.HTTP_409_CONFLICT
+                )
             
             return Response(
                 OrderSerializer(order).data,
@@ -84,9 +66,11 @@ class CreateOrderView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # Nested item payloads embed the current product representation
+    validator_related_fields = ('items__product__updated_at',)
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -95,7 +79,7 @@ class OrderDetailView(generics.RetrieveAPIView):
 
     def get_object(self):
         obj = super().get_object()
-        if obj.user != self.request.user:
+        if obj.user_id != self.request.user.id:
             raise PermissionDenied("You don't have permission to access this order.")
         return obj
 
@@ -119,9 +103,12 @@ class CancelOrderView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Cancel the order
-        order.status = 'cancelled'
-        order.save()
+        # Cancel the order and return its stock
+        if not release_order(order, 'cancelled'):
+            return Response(
+                {'error': 'Cannot cancel order. Order is already cancelled.'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'message': 'Order cancelled successfully.',
@@ -133,16 +120,26 @@ class OrderStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        order = get_object_or_404(Order, pk=pk, user=request.user)
+        order = get_object_or_404(
+            Order.objects.only('id', 'user_id', 'status', 'payment_status', 'updated_at'),
+            pk=pk,
+            user=request.user
+        )
         
-        if order.user != request.user:
+        if order.user_id != request.user.id:
             raise PermissionDenied("You don't have permission to view this order.")
+
+        etag, last_modified = build_validators({'id': order.id, 'last_modified': order.updated_at})
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
             
-        return Response({
+        response = Response({
             'order_id': order.id,
             'status': order.status,
             'payment_status': order.payment_status
         })
+        return set_validators(response, etag, last_modified)
 
 
 class TrackOrderView(APIView):
@@ -176,7 +173,7 @@ class TrackOrderView(APIView):
         return Response(tracking_data)
 
 
-class OrderHistoryView(generics.ListAPIView):
+class OrderHistoryView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -204,9 +201,11 @@ class ProcessPaymentView(APIView):
             payment_method = serializer.validated_data['payment_method']
             
             # Simulate payment processing
-            order.payment_status = 'paid'
-            order.status = 'completed'
-            order.save()
+            if not complete_payment(order):
+                return Response(
+                    {'error': f'Cannot pay for a {order.status} order.'}, 
+                    status=status.HTTP_409_CONFLICT
+                )
             
             return Response({
                 'message': 'Payment processed successfully.',
@@ -223,10 +222,11 @@ class ConfirmPaymentView(APIView):
         order = get_object_or_404(Order, pk=pk, user=request.user)
         
         # Mock payment confirmation
-        if order.payment_status == 'unpaid':
-            order.payment_status = 'paid'
-            order.status = 'completed'
-            order.save()
+        if order.payment_status == 'unpaid' and not complete_payment(order):
+            return Response(
+                {'error': f'Cannot pay for a {order.status} order.'}, 
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response({
             'message': 'Payment confirmed.',
@@ -234,7 +234,7 @@ class ConfirmPaymentView(APIView):
         })
 
 
-class AdminOrderListView(generics.ListAPIView):
+class AdminOrderListView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     queryset = Order.objects.all().order_by('-created_at')
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
@@ -248,6 +248,16 @@ class UpdateOrderStatusView(APIView):
         serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
         
         if serializer.is_valid():
-            serializer.save()
+            new_status = serializer.validated_data.get('status', order.status)
+            if order.status in RELEASED_STATUSES and new_status not in RELEASED_STATUSES:
+                return Response(
+                    {'error': f'Cannot reopen a {order.status} order; its stock was released.'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if new_status in RELEASED_STATUSES:
+                # Payment failed: return the reserved stock
+                release_order(order, new_status)
+            else:
+                serializer.save()
             return Response(OrderSerializer(order).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from catalog.models import Product
+from reviews.models import Review
+
+
+RATING_FIELDS = ['rating_count', 'rating_sum'] + [f'rating_{i}_count' for i in range(1, 6)]
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized rating columns on Product from the Review table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of products recomputed per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+
+        updated = 0
+        batch = []
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                updated += self.rebuild_batch(batch)
+                batch = []
+        if batch:
+            updated += self.rebuild_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating summaries for {updated} products"))
+
+    def rebuild_batch(self, product_ids):
+        with transaction.atomic():
+            # Lock the products first so concurrent review writes wait for the rebuild
+            products = list(
+                Product.objects.select_for_update().filter(pk__in=product_ids).only('pk', *RATING_FIELDS)
+            )
+            rows = (
+                Review.objects.filter(product_id__in=product_ids)
+                .values('product_id')
+                .annotate(
+                    rating_count=Count('id'),
+                    rating_sum=Sum('rating'),
+                    **{f'rating_{i}_count': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+                )
+            )
+            summaries = {row.pop('product_id'): row for row in rows}
+
+            for product in products:
+                summary = summaries.get(product.pk, {})
+                for field in RATING_FIELDS:
+                    setattr(product, field, summary.get(field, 0))
+            Product.objects.bulk_update(products, RATING_FIELDS)
+        return len(products)
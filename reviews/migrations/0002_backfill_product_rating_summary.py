@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:40
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    rows = (
+        Review.objects.values('product_id')
+        .annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{i}_count': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+        )
+        .order_by()
+    )
+    for row in rows.iterator():
+        Product.objects.filter(pk=row.pop('product_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_rating_summary'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
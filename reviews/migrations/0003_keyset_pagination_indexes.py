@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_keyset_pagination_indexes'),
+        ('reviews', '0002_backfill_product_rating_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'id'], name='reviews_rev_created_2254c1_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import User
 from catalog.models import Product
 
@@ -14,6 +14,18 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ['user', 'product']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the review row and the product rating columns in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} review for {self.product.title}"
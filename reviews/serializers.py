@@ -3,9 +3,10 @@ from django.db.models import Avg
 from .models import Review
 from catalog.serializers import ProductSerializer
 from users.models import User
+from ecommerce_backend.sparse_fields import SparseFieldsetMixin
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     product_title = serializers.CharField(source='product.title', read_only=True)
 
@@ -16,6 +17,7 @@ class ReviewSerializer(serializers.ModelSerializer):
             'rating', 'comment', 'created_at'
         ]
         read_only_fields = ['id', 'user', 'created_at']
+        expandable_fields = {'product': (ProductSerializer, {})}
 
     def validate_rating(self, value):
         if value < 1 or value > 5:
@@ -0,0 +1,60 @@
+from django.db.models import F
+from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from catalog.cache import invalidate
+from catalog.models import Product
+from .models import Review
+
+
+def rating_delta(rating, sign):
+    """Build the F() updates that add (sign=1) or remove (sign=-1) one rating"""
+    return {
+        'rating_count': F('rating_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        f'rating_{rating}_count': F(f'rating_{rating}_count') + sign,
+    }
+
+
+def apply_rating(product_id, rating, sign):
+    # update() skips auto_now, so bump updated_at explicitly: the product
+    # payload changes with its rating
+    Product.objects.filter(pk=product_id).update(
+        updated_at=timezone.now(), **rating_delta(rating, sign)
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk)
+        .values_list('product_id', 'rating')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    current = (instance.product_id, instance.rating)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_rating(previous[0], previous[1], -1)
+    apply_rating(current[0], current[1], 1)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating(instance.product_id, instance.rating, -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, **kwargs):
+    invalidate('review')
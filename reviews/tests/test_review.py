@@ -1,4 +1,8 @@
+from io import StringIO
 from django.test import TestCase
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
 from django.db import IntegrityError
 from users.models import User
 from catalog.models import Category, Product
@@ -55,3 +59,81 @@ class ReviewModelTest(TestCase):
                 rating=4,
                 comment="Changed my mind."
             )
+
+
+class ProductRatingSummaryTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rater", email="rater@example.com", password="pass1234")
+        self.other_user = User.objects.create_user(username="rater2", email="rater2@example.com", password="pass1234")
+        self.category = Category.objects.create(name="Phones")
+        self.product = Product.objects.create(
+            title="Pixel",
+            description="Android phone",
+            price=599.99,
+            stock_quantity=5,
+            category=self.category
+        )
+
+    def test_summary_tracks_create_update_delete(self):
+        review = Review.objects.create(user=self.user, product=self.product, rating=5)
+        Review.objects.create(user=self.other_user, product=self.product, rating=2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_sum, 7)
+        self.assertEqual(self.product.average_rating, 3.5)
+        self.assertEqual(self.product.rating_distribution, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+
+        review.rating = 3
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 5)
+        self.assertEqual(self.product.rating_5_count, 0)
+        self.assertEqual(self.product.rating_3_count, 1)
+
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.rating_sum, 2)
+        self.assertEqual(self.product.rating_3_count, 0)
+
+    def test_rebuild_command_recomputes_summary(self):
+        Review.objects.create(user=self.user, product=self.product, rating=4)
+        Product.objects.filter(pk=self.product.pk).update(rating_count=0, rating_sum=0, rating_4_count=0)
+
+        call_command('rebuild_product_ratings', stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.rating_sum, 4)
+        self.assertEqual(self.product.rating_4_count, 1)
+
+
+class ReviewExpandTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="expander", email="expander@example.com", password="pass1234")
+        self.category = Category.objects.create(name="Tablets")
+        self.product = Product.objects.create(
+            title="iPad",
+            description="Apple tablet",
+            price=499.99,
+            stock_quantity=4,
+            category=self.category
+        )
+        Review.objects.create(user=self.user, product=self.product, rating=4)
+
+    def test_product_is_a_primary_key_by_default(self):
+        response = self.client.get(reverse('review_list'))
+        self.assertEqual(response.data['results'][0]['product'], self.product.pk)
+
+    def test_expand_embeds_sparse_product(self):
+        response = self.client.get(
+            reverse('review_list'),
+            {'expand': 'product', 'fields': 'id,rating,product.title,product.average_rating'}
+        )
+        self.assertEqual(response.data['results'][0], {
+            'id': response.data['results'][0]['id'],
+            'rating': 4,
+            'product': {'title': 'iPad', 'average_rating': 4.0},
+        })
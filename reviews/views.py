@@ -1,5 +1,4 @@
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg, Count
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -13,10 +12,12 @@ from .serializers import (
     ReportReviewSerializer
 )
 from catalog.models import Product
+from ecommerce_backend.compiled import CompiledListMixin
+from ecommerce_backend.sparse_fields import SparseFieldsetViewMixin
 from users.models import User
 
 
-class ReviewListView(generics.ListAPIView):
+class ReviewListView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     queryset = Review.objects.all().order_by('-created_at')
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -27,7 +28,7 @@ class CreateReviewView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ReviewDetailView(generics.RetrieveAPIView):
+class ReviewDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -52,7 +53,7 @@ class DeleteReviewView(generics.DestroyAPIView):
         return Review.objects.filter(user=self.request.user)
 
 
-class ProductReviewsView(generics.ListAPIView):
+class ProductReviewsView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -66,34 +67,18 @@ class ProductReviewStatsView(APIView):
 
     def get(self, request, product_id):
         product = get_object_or_404(Product, id=product_id)
-        reviews = Review.objects.filter(product=product)
-        
-        if not reviews.exists():
-            return Response({
-                'total_reviews': 0,
-                'average_rating': 0,
-                'rating_distribution': {str(i): 0 for i in range(1, 6)}
-            })
-        
-        total_reviews = reviews.count()
-        average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-        
-        # Calculate rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = reviews.filter(rating=i).count()
-            rating_distribution[str(i)] = count
-        
+
+        # Served from the denormalized rating columns on Product
         data = {
-            'total_reviews': total_reviews,
-            'average_rating': round(average_rating, 2) if average_rating else 0,
-            'rating_distribution': rating_distribution
+            'total_reviews': product.rating_count,
+            'average_rating': product.average_rating,
+            'rating_distribution': product.rating_distribution
         }
         
         return Response(data)
 
 
-class UserReviewsView(generics.ListAPIView):
+class UserReviewsView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
 
@@ -103,7 +88,7 @@ class UserReviewsView(generics.ListAPIView):
         return Review.objects.filter(user=self.request.user).order_by('-created_at')
 
 
-class UserReviewListView(generics.ListAPIView):
+class UserReviewListView(SparseFieldsetViewMixin, CompiledListMixin, generics.ListAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 